@@ -0,0 +1,292 @@
+import asyncio
+import threading
+
+from flask import Blueprint, render_template, request, abort, current_app
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from models import Venue, Artist, Show, show_stats_stmt
+from search import search, search_stmt
+from summary import summary_enabled, ensure_fresh
+from queries import keyset_query, keyset_result, detail_statements, \
+    area_keys, area_list, area_venues_stmt, area_page, filter_shows, \
+    show_stmt, show_filter, show_day_counts_stmt, page_args, \
+    SHOW_TILE_FIELDS
+
+# ----------------------------------------------------------------------------#
+# Async read path.
+#
+# /async/venues, /async/artists, /async/shows, the /async search routes and
+# the /async detail pages render the same templates as their sync
+# counterparts, but read through SQLAlchemy's asyncio extension on asyncpg.
+# The async engine and its pool live on one event loop in a background
+# thread, shared by every request in the process; views await their
+# queries on it, so a page whose statements do not depend on each other
+# runs them at the same time on separate connections. Detail pages fetch
+# the entity, its upcoming shows and its past shows concurrently.
+#
+# This does not lift the cap that worker count puts on throughput. Flask
+# is a WSGI framework: it runs each async view to completion, through
+# asgiref, on the worker thread that took the request, and that thread is
+# busy until the response is built, under an ASGI server too. What the
+# async path buys is per-request latency, since a page's independent
+# queries overlap. Serving requests themselves from an event loop would
+# take an ASGI framework such as Quart.
+#
+# The statements are built by the same functions as the sync path
+# (queries.py); only execution differs. These routes bypass the page cache
+# and conditional GET so that benchmarks/async_routes.py compares the
+# database paths.
+# ----------------------------------------------------------------------------#
+
+aio = Blueprint('aio', __name__, url_prefix='/async')
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg'}
+
+
+def async_url(config):
+    """ASYNC_DATABASE_URI, or SQLALCHEMY_DATABASE_URI on the asyncpg driver."""
+    if config.get('ASYNC_DATABASE_URI'):
+        return make_url(config['ASYNC_DATABASE_URI'])
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'no async driver for {backend!r} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def async_engine_options(config):
+    options = dict(config.get('ASYNC_ENGINE_OPTIONS', {}))
+    if config.get('PGBOUNCER_MODE'):
+        # asyncpg prepares every statement; transaction pooling cannot
+        # keep them, so turn both statement caches off.
+        options['connect_args'] = {'statement_cache_size': 0,
+                                   **options.get('connect_args', {})}
+        options['prepared_statement_cache_size'] = 0
+    return options
+
+
+class AsyncDatabase:
+    """Flask extension owning the async engine and the loop it runs on.
+
+    Both are created by the first async request, so create_app() starts no
+    threads and importing this module does not need asyncpg to connect.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['async_db'] = {'loop': None, 'engine': None,
+                                      'lock': threading.Lock()}
+
+    def _start(self, app):
+        state = app.extensions['async_db']
+        with state['lock']:
+            if state['loop'] is None:
+                # Imported here: the asyncio extension costs web workers
+                # startup time whether or not they serve /async.
+                from sqlalchemy.ext.asyncio import create_async_engine
+                engine = create_async_engine(async_url(app.config),
+                                             **async_engine_options(app.config))
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fyyur-aio',
+                                 daemon=True).start()
+                state['engine'], state['loop'] = engine, loop
+        return state['loop'], state['engine']
+
+    async def run(self, fn, *args, **kwargs):
+        """Await fn(engine, *args, **kwargs) on the database loop.
+
+        The coroutine runs in a copy of the caller's context, so request
+        metrics still count its statements.
+        """
+        loop, engine = self._start(current_app._get_current_object())
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(fn(engine, *args, **kwargs), loop))
+
+    def dispose(self, app):
+        """Close the pool and stop the loop (benchmarks, tests)."""
+        state = app.extensions['async_db']
+        with state['lock']:
+            loop, engine = state['loop'], state['engine']
+            state['loop'] = state['engine'] = None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(engine.dispose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
+async_db = AsyncDatabase()
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+async def _all(engine, stmt):
+    async with engine.connect() as connection:
+        return (await connection.execute(stmt)).mappings().all()
+
+
+async def _rows(engine, stmt):
+    async with engine.connect() as connection:
+        return (await connection.execute(stmt)).all()
+
+
+async def _first(engine, stmt):
+    async with engine.connect() as connection:
+        return (await connection.execute(stmt)).mappings().first()
+
+
+async def _keyset_page(engine, stmt, keys, after=None, before=None,
+                       per_page=None):
+    stmt, seek = keyset_query(stmt, keys, after, before, per_page)
+    return keyset_result(list(await _all(engine, stmt)), seek)
+
+
+async def detail(engine, model, entity_id):
+    """venue_detail()/artist_detail() from three concurrent statements."""
+    row, upcoming, past = await asyncio.gather(
+        *[_first(engine, stmt)
+          for stmt in detail_statements(model, entity_id)])
+    if row is None:
+        return None
+    return {**row, **upcoming, **past}
+
+
+async def artist_page(engine, after=None, before=None, per_page=None):
+    return await _keyset_page(engine, select(Artist.id, Artist.name),
+                              [Artist.name, Artist.id],
+                              after, before, per_page)
+
+
+async def venue_area_page(engine, summary, after=None, before=None,
+                          per_page=None):
+    keys = area_keys(summary)
+    page = await _keyset_page(engine, select(*keys).group_by(*keys), keys,
+                              after, before, per_page)
+    if not page.items:
+        return page
+    rows = await _rows(engine, area_venues_stmt(summary, area_list(page)))
+    if not summary:
+        stats = await _show_stats(engine, Show.venue_id,
+                                  [row.id for row in rows])
+        rows = [(*row, stats[row.id][0]) for row in rows]
+    return area_page(page, rows)
+
+
+async def show_page(engine, calendar, after=None, before=None,
+                    per_page=None):
+    """The /shows page and, for a filtered one, its per-day counts, fetched
+    concurrently."""
+    stmt = filter_shows(show_stmt(SHOW_TILE_FIELDS), calendar)
+    listing = _keyset_page(engine, stmt, [Show.start_time, Show.id],
+                           after, before, per_page)
+    if calendar is None:
+        page, days = await listing, []
+    else:
+        page, days = await asyncio.gather(
+            listing, _rows(engine, show_day_counts_stmt(calendar)))
+    return page._replace(items=[dict(row) for row in page.items]), \
+        [(row[0], row[1]) for row in days]
+
+
+async def _show_stats(engine, owner_fk, ids):
+    stats = dict.fromkeys(ids, (0, 0))
+    if stats:
+        async with engine.connect() as connection:
+            for owner_id, upcoming, past in await connection.execute(
+                    show_stats_stmt(owner_fk, list(stats))):
+                stats[owner_id] = (upcoming, past)
+    return stats
+
+
+async def find(engine, model, term, rows=None):
+    """find_venues()/find_artists() results.
+
+    `rows` are matches the in-process search backend already found.
+    """
+    if rows is None:
+        rows = await _rows(engine, search_stmt(model, term))
+    stats = await _show_stats(engine, model._show_fk(),
+                              [entity_id for entity_id, _ in rows])
+    data = [{'id': entity_id,
+             'name': name,
+             'num_upcoming_shows': stats[entity_id][0]}
+            for entity_id, name in rows]
+    return {'count': len(data), 'data': data}
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@aio.route('/venues')
+async def venues():
+    summary = summary_enabled()
+    if summary:
+        ensure_fresh()
+    page = await async_db.run(venue_area_page, summary,
+                              **page_args(request.args))
+    return render_template('pages/venues.html', areas=page.items, page=page)
+
+
+@aio.route('/venues/search', methods=['POST'])
+async def search_venues():
+    term = request.form.get('search_term', '')
+    response = await async_db.run(find, Venue, term,
+                                  _memory_search(Venue, term))
+    return render_template('pages/search_venues.html', results=response,
+                           search_term=term)
+
+
+@aio.route('/venues/<int:venue_id>')
+async def show_venue(venue_id):
+    data = await async_db.run(detail, Venue, venue_id)
+    if data is None:
+        abort(404)
+    return render_template('pages/show_venue.html', venue=data)
+
+
+@aio.route('/artists')
+async def artists():
+    page = await async_db.run(artist_page, **page_args(request.args))
+    return render_template('pages/artists.html', artists=page.items, page=page)
+
+
+@aio.route('/artists/search', methods=['POST'])
+async def search_artists():
+    term = request.form.get('search_term', '')
+    response = await async_db.run(find, Artist, term,
+                                  _memory_search(Artist, term))
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=term)
+
+
+@aio.route('/artists/<int:artist_id>')
+async def show_artist(artist_id):
+    data = await async_db.run(detail, Artist, artist_id)
+    if data is None:
+        abort(404)
+    return render_template('pages/show_artist.html', artist=data)
+
+
+@aio.route('/shows')
+async def shows():
+    filter_error = None
+    try:
+        calendar = show_filter(request.args)
+    except ValueError as err:
+        calendar, filter_error = None, str(err)
+    page, days = await async_db.run(show_page, calendar,
+                                    **page_args(request.args))
+    return render_template('pages/shows.html', shows=page.items, page=page,
+                           days=days, filter_error=filter_error)
+
+
+def _memory_search(model, term):
+    # The in-process index is read on the request's own thread and session.
+    if current_app.config.get('SEARCH_BACKEND', 'postgres') == 'memory':
+        return search(model, term)
+    return None
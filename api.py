@@ -0,0 +1,195 @@
+from datetime import datetime
+
+from flask import Blueprint, Response, request, jsonify, url_for, abort, \
+    stream_with_context
+
+from models import Venue, Artist
+from cache import conditional
+from exporter import EXPORT_MODELS, EXPORT_FORMATS, export_stream, \
+    export_filename, parse_since
+from queries import entity_fields, entity_page, entity_row, show_stmt, \
+    show_rows_page, page_args, DETAIL_SHOW_FIELDS, SHOW_FIELDS, \
+    venue_validator, artist_validator, catalog_validator, show_filter, \
+    filter_shows, show_day_counts
+import typeahead
+
+# ----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+# Every collection takes ?fields=a,b,c (sparse fieldsets) plus the keyset
+# pagination parameters used by the HTML listings (after, before,
+# per_page). Rows are serialized straight from result tuples.
+# ----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_DEFAULT_FIELDS = ('id', 'name', 'city', 'state')
+ARTIST_DEFAULT_FIELDS = ('id', 'name', 'city', 'state')
+SHOW_DEFAULT_FIELDS = ('id', 'start_time', 'venue_id', 'artist_id')
+
+
+class FieldError(ValueError):
+    pass
+
+
+def requested_fields(allowed, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise FieldError('unknown field(s): ' + ', '.join(unknown))
+    return fields
+
+
+def serialize(row, fields):
+    return {f: row[f].isoformat() if isinstance(row[f], datetime) else row[f]
+            for f in fields}
+
+
+def page_response(page, fields, **extra):
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    links = {'next': None, 'prev': None}
+    if page.next_cursor:
+        links['next'] = url_for(request.endpoint, after=page.next_cursor, **args)
+    if page.prev_cursor:
+        links['prev'] = url_for(request.endpoint, before=page.prev_cursor, **args)
+    return jsonify({'data': [serialize(row, fields) for row in page.items],
+                    'links': links,
+                    'per_page': page.per_page,
+                    **extra})
+
+
+def _collection(model, default):
+    fields = requested_fields(entity_fields(model), default)
+    page = entity_page(model, fields, **page_args(request.args))
+    return page_response(page, fields)
+
+
+def _item(model, entity_id, default):
+    allowed = list(entity_fields(model)) + list(DETAIL_SHOW_FIELDS)
+    fields = requested_fields(allowed, default)
+    row = entity_row(model, entity_id, fields)
+    if row is None:
+        abort(404)
+    return jsonify({'data': serialize(row, fields)})
+
+
+@api.route('/venues')
+@conditional(catalog_validator)
+def list_venues():
+    return _collection(Venue, VENUE_DEFAULT_FIELDS)
+
+
+@api.route('/venues/<int:venue_id>')
+@conditional(venue_validator)
+def get_venue(venue_id):
+    return _item(Venue, venue_id,
+                 list(entity_fields(Venue)) + list(DETAIL_SHOW_FIELDS))
+
+
+@api.route('/artists')
+@conditional(catalog_validator)
+def list_artists():
+    return _collection(Artist, ARTIST_DEFAULT_FIELDS)
+
+
+@api.route('/artists/<int:artist_id>')
+@conditional(artist_validator)
+def get_artist(artist_id):
+    return _item(Artist, artist_id,
+                 list(entity_fields(Artist)) + list(DETAIL_SHOW_FIELDS))
+
+
+def _names(model):
+    try:
+        limit = int(request.args.get('limit', typeahead.DEFAULT_LIMIT))
+    except ValueError:
+        raise FieldError('limit must be an integer')
+    matches = typeahead.lookup(model, request.args.get('q', ''), limit)
+    return jsonify({'data': [{'id': entity_id, 'name': name}
+                             for entity_id, name in matches]})
+
+
+@api.route('/venues/names')
+def venue_names():
+    # Typeahead for the new-show form: ?q=<name prefix>[&limit=10]
+    return _names(Venue)
+
+
+@api.route('/artists/names')
+def artist_names():
+    return _names(Artist)
+
+
+@api.route('/shows')
+@conditional(catalog_validator)
+def list_shows():
+    fields = requested_fields(SHOW_FIELDS, SHOW_DEFAULT_FIELDS)
+    try:
+        calendar = show_filter(request.args)
+    except ValueError as err:
+        raise FieldError(str(err))
+    page = show_rows_page(filter_shows(show_stmt(fields), calendar),
+                          **page_args(request.args))
+    if calendar is None:
+        return page_response(page, fields)
+    days = [{'date': day.isoformat(), 'shows': count}
+            for day, count in show_day_counts(calendar)]
+    return page_response(page, fields, days=days)
+
+
+@api.route('/shows/batch', methods=['POST'])
+def create_show_batch():
+    # {"shows": [{"artist_id": 1, "venue_id": 2, "start_time": "..."}, ...],
+    #  "atomic": false}; rows are numbered from 1 in the errors.
+    from importer import create_show_batch
+    body = request.get_json(silent=True)
+    if isinstance(body, list):
+        body = {'shows': body}
+    if not isinstance(body, dict) or not isinstance(body.get('shows'), list):
+        raise FieldError('expected a JSON object with a "shows" list')
+    atomic = bool(body.get('atomic')) or request.args.get('atomic') == '1'
+    try:
+        report, ids = create_show_batch(enumerate(body['shows'], 1), atomic)
+    except ValueError as err:
+        raise FieldError(str(err))
+    errors = [{'row': line, 'errors': errors}
+              for line, errors, _ in report.rejected]
+    status = 201 if ids else (422 if errors else 200)
+    return jsonify({'created': len(ids), 'ids': ids, 'errors': errors}), status
+
+
+@api.route('/export/<kind>')
+def export(kind):
+    # Full or incremental (?since=) dump, streamed as it is read.
+    if kind not in EXPORT_MODELS:
+        abort(404)
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        raise FieldError(f'unknown format {fmt!r}')
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as err:
+        raise FieldError(str(err))
+    compress = request.args.get('gzip') == '1'
+    mimetype = 'application/gzip' if compress else \
+        ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    filename = export_filename(kind, fmt, compress)
+    return Response(
+        stream_with_context(export_stream(kind, fmt, since, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@api.errorhandler(FieldError)
+def field_error(error):
+    return jsonify({'error': str(error)}), 400
+
+
+@api.errorhandler(404)
+def not_found_error(error):
+    return jsonify({'error': 'not found'}), 404
@@ -2,55 +2,163 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import csv
+import io
 import os
+from datetime import datetime, timezone
+from functools import lru_cache
 
+import click
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, \
-    flash, redirect, url_for, abort, jsonify
+import babel.dates
+from flask import Flask, Blueprint, render_template, request, \
+    flash, redirect, url_for, abort, jsonify, Response, \
+    stream_template, current_app
+from flask.cli import with_appcontext
 from flask_moment import Moment
+from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
-from sqlalchemy import func
-from forms import *
-from flask_migrate import Migrate
-from models import db, Venue, Artist, Show
+from models import db, Venue, Artist, Show, Job
+from forms import VenueForm, ArtistForm, ShowForm, ShowBatchForm
+from pool import engine_options, pool_stats
+from metrics import RequestMetrics
+from summary import create_area_summary, refresh_area_summary
+from search import create_search_objects
+from cache import page_cache, FragmentCache, tag_page, venue_tag, \
+    artist_tag, area_tag, conditional
+from queries import venue_detail, artist_detail, find_venues, find_artists, \
+    show_page, artist_page, venue_area_page, venue_validator, \
+    artist_validator, catalog_validator, venue_area_validator, \
+    venue_area_version, page_args, show_filter, show_day_counts
+from api import api
+from importer import import_command, create_show_batch, read_rows
+from exporter import export_command
+from jobs import runner as jobs, jobs_command
+from aio import aio, async_db
+from assets import assets, assets_command
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migration = Migrate(app, db)
+bp = Blueprint('main', __name__)
+moment = Moment()
+fragment_cache = FragmentCache()
+request_metrics = RequestMetrics()
+
+
+def create_app(test_config=None):
+    """Build the Flask app.
+
+    Importing this module only defines the routes; extensions are bound and
+    engines created here, and nothing connects to the database until a
+    request needs it. Create tables with `flask db upgrade` (or
+    `flask init-db` for a throwaway database).
+    """
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    moment.init_app(app)
+    db.init_app(app)
+    Migrate(app, db)
+    page_cache.init_app(app)
+    fragment_cache.init_app(app)
+    request_metrics.init_app(app)
+    jobs.init_app(app)
+    async_db.init_app(app)
+    assets.init_app(app)
+    app.register_blueprint(bp)
+    app.register_blueprint(api)
+    app.register_blueprint(aio)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(refresh_area_summary_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(jobs_command)
+    app.cli.add_command(assets_command)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+    return app
+
 
-with app.app_context():
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables directly from the models."""
     db.create_all()
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as connection:
+            create_search_objects(connection)
+            create_area_summary(connection)
+    click.echo('Created database tables.')
+
+
+@click.command('refresh-area-summary')
+@with_appcontext
+def refresh_area_summary_command():
+    """Refresh the /venues area summary; run it from cron or a scheduler."""
+    refresh_area_summary()
+    click.echo('Refreshed venue_area_summary.')
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+@lru_cache(maxsize=64)
+def _datetime_pattern(format, locale):
+    # Babel patterns and locales compiled once per (format, locale).
+    pattern = DATETIME_FORMATS.get(format, format)
+    return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+
+@bp.app_template_global()
+def pager_url(**cursor):
+    # the current listing URL, keeping its filters, at another cursor
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    return url_for(request.endpoint, **args, **cursor)
+
+
+@bp.app_template_filter('datetime')
+def format_datetime(value, format='medium', locale='en'):
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        # what babel.dates.format_datetime assumes for naive values
+        value = value.replace(tzinfo=timezone.utc)
+    pattern, locale = _datetime_pattern(format, locale)
+    return pattern.apply(value, locale)
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
+@page_cache.cached()
 def index():
     return render_template('pages/home.html')
 
@@ -58,21 +166,16 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
+@conditional(venue_area_validator)
+@page_cache.cached(tags=['venues'], version=venue_area_version)
 def venues():
     try:
-        query = db.session.query(func.json_build_object(
-            'city', Venue.city,
-            'state', Venue.state,
-            'venues', func.array_agg(
-                func.json_build_object(
-                    'id', Venue.id,
-                    'name', Venue.name,
-                    'num_upcoming_shows', Venue.upcoming_shows_count
-                )
-            ))).group_by(Venue.city, Venue.state)
-        data = [i[0] for i in query]
-        return render_template('pages/venues.html', areas=data)
+        page = venue_area_page(**page_args(request.args))
+        for area in page.items:
+            tag_page(area_tag(area['state'], area['city']),
+                     *[venue_tag(v['id']) for v in area['venues']])
+        return render_template('pages/venues.html', areas=page.items, page=page)
     except Exception as err:
         if getattr(err, 'code', None) == 500:
             server_error(abort(500))
@@ -80,17 +183,10 @@ def venues():
             print(err)
 
 
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/search', methods=['POST'])
 def search_venues():
     try:
-        query = Venue.query. \
-            filter(Venue.name.ilike(f"%{request.form.get('search_term')}%"))
-        data_list = [{
-            'id': v.id,
-            'name': v.name,
-            'num_upcoming_shows': v.upcoming_shows_count
-        } for v in query]
-        response = {'count': len(data_list), 'data': data_list}
+        response = find_venues(request.form.get('search_term', ''))
         return render_template('pages/search_venues.html', results=response,
                                search_term=request.form.get('search_term', ''))
     except Exception as err:
@@ -100,62 +196,18 @@ def search_venues():
             print(err)
 
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@conditional(venue_validator)
+@page_cache.cached()
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    # try:
-    #     data = Venue.query.get_or_404(venue_id)
-    #     return render_template('pages/show_venue.html', venue=data)
-    # except Exception as err:
-    #     if err.code == 404:
-    #         not_found_error(abort(404))
-    #     else:
-    #         server_error(abort(500))
-
     try:
-        venue = Venue.query.get_or_404(venue_id)
-        venue_dict = dict(
-            (col, getattr(venue, col)) for col in venue.__table__.columns.keys()
-        )
-
-        upcoming_shows = db.session.query(
-            func.array_agg(
-                func.json_build_object(
-                    'artist_id', Artist.id,
-                    'artist_name', Artist.name,
-                    'artist_image_link', Artist.image_link,
-                    'start_time', Show.start_time
-                )
-            ),
-            func.count(Show.venue_id)
-        ) \
-            .select_from(Artist) \
-            .join(Show) \
-            .filter(Show.venue_id == venue_id, Show.start_time > datetime.now()).first()
-
-        past_shows = db.session.query(
-            func.array_agg(
-                func.json_build_object(
-                    'artist_id', Artist.id,
-                    'artist_name', Artist.name,
-                    'artist_image_link', Artist.image_link,
-                    'start_time', Show.start_time
-                )
-            ),
-            func.count(Show.venue_id)
-        ) \
-            .select_from(Artist) \
-            .join(Show) \
-            .filter(Show.venue_id == venue_id, Show.start_time < datetime.now()).first()
-
-        data = venue_dict | {'upcoming_shows': upcoming_shows[0],
-                             'upcoming_shows_count': upcoming_shows[1],
-                             'past_shows': past_shows[0],
-                             'past_shows_count': past_shows[1]}
-        if not data['upcoming_shows']:
-            data['upcoming_shows'] = []
-        if not data['past_shows']:
-            data['past_shows'] = []
+        data = venue_detail(venue_id)
+        if data is None:
+            abort(404)
+        tag_page(venue_tag(venue_id),
+                 *[artist_tag(s['artist_id'])
+                   for s in data['upcoming_shows'] + data['past_shows']])
         return render_template('pages/show_venue.html', venue=data)
     except Exception as err:
         if getattr(err, 'code', None) == 500:
@@ -169,17 +221,19 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     form = VenueForm(request.form, meta={'csrf': False})
     if form.validate():
         try:
+            new_area = not db.session.query(Venue.query.filter_by(
+                state=form.state.data, city=form.city.data).exists()).scalar()
             venue = Venue(
                 name=form.name.data,
                 city=form.city.data,
@@ -195,8 +249,10 @@ def create_venue_submission():
             )
             db.session.add(venue)
             db.session.commit()
+            page_cache.invalidate('venues' if new_area else
+                                  area_tag(form.state.data, form.city.data))
             flash('Venue ' + form.name.data + ' was successfully listed!')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         except Exception as err:
             db.session.rollback()
             flash(f"An error occurred. Venue {form.name.data} couldn't be listed")
@@ -215,12 +271,17 @@ def create_venue_submission():
         return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+    # the cascade can take seconds for a busy venue, so it runs as a job
     try:
-        Venue.query.filter_by(id=venue_id).delete()
-        db.session.commit()
-        return jsonify({'success': True})
+        if not venue_id.isdigit() or db.session.get(Venue, int(venue_id)) is None:
+            return jsonify({'success': False}), 404
+        job_id = jobs.enqueue('delete_venue', venue_id=int(venue_id))
+        status_url = url_for('.job_status', job_id=job_id)
+        return jsonify({'success': True, 'job_id': job_id,
+                        'status_url': status_url}), 202, \
+            {'Location': status_url}
     except Exception as err:
         db.session.rollback()
         if getattr(err, 'code', None) == 500:
@@ -233,12 +294,14 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
+@conditional(catalog_validator)
+@page_cache.cached(tags=['artists'])
 def artists():
     try:
-        artists_list = Artist.query.all()
-        data = [{'id': a.id, 'name': a.name} for a in artists_list]
-        return render_template('pages/artists.html', artists=data)
+        page = artist_page(**page_args(request.args))
+        tag_page(*[artist_tag(a['id']) for a in page.items])
+        return render_template('pages/artists.html', artists=page.items, page=page)
     except Exception as err:
         if getattr(err, 'code', None) == 500:
             server_error(abort(500))
@@ -246,15 +309,10 @@ def artists():
             print(err)
 
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['POST'])
 def search_artists():
     try:
-        query = Artist.query. \
-            filter(Artist.name.ilike(f'%{request.form.get("search_term")}%')).all()
-        data_list = [{'id': a.id,
-                      'name': a.name,
-                      'num_upcoming_shows': a.upcoming_shows_count} for a in query]
-        response = {'count': len(query), 'data': data_list}
+        response = find_artists(request.form.get('search_term', ''))
         return render_template('pages/search_artists.html', results=response,
                                search_term=request.form.get('search_term', ''))
     except Exception as err:
@@ -264,64 +322,18 @@ def search_artists():
             print(err)
 
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@conditional(artist_validator)
+@page_cache.cached()
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
-    # try:
-    #     data = Artist.query.get_or_404(artist_id)
-    #     return render_template('pages/show_artist.html', artist=data)
-    # except Exception as err:
-    #     if getattr(err, 'code', None) == 500:
-    #         server_error(abort(500))
-    #     if getattr(err, 'code', None) == 404:
-    #         server_error(abort(404))
-    #     else:
-    #         print(err)
-
     try:
-        artist = Artist.query.get_or_404(artist_id)
-        artist_dict = dict(
-            (col, getattr(artist, col)) for col in artist.__table__.columns.keys()
-        )
-
-        upcoming_shows = db.session.query(
-            func.array_agg(
-                func.json_build_object(
-                    'venue_id', Venue.id,
-                    'venue_name', Venue.name,
-                    'venue_image_link', Venue.image_link,
-                    'start_time', Show.start_time
-                )
-            ),
-            func.count(Show.venue_id)
-        ) \
-            .select_from(Venue) \
-            .join(Show) \
-            .filter(Show.artist_id == artist_id, Show.start_time > datetime.now()).first()
-
-        past_shows = db.session.query(
-            func.array_agg(
-                func.json_build_object(
-                    'venue_id', Venue.id,
-                    'venue_name', Venue.name,
-                    'venue_image_link', Venue.image_link,
-                    'start_time', Show.start_time
-                )
-            ),
-            func.count(Show.venue_id)
-        ) \
-            .select_from(Venue) \
-            .join(Show) \
-            .filter(Show.artist_id == artist_id, Show.start_time < datetime.now()).first()
-
-        data = artist_dict | {'upcoming_shows': upcoming_shows[0],
-                              'upcoming_shows_count': upcoming_shows[1],
-                              'past_shows': past_shows[0],
-                              'past_shows_count': past_shows[1]}
-        if not data['upcoming_shows']:
-            data['upcoming_shows'] = []
-        if not data['past_shows']:
-            data['past_shows'] = []
+        data = artist_detail(artist_id)
+        if data is None:
+            abort(404)
+        tag_page(artist_tag(artist_id),
+                 *[venue_tag(s['venue_id'])
+                   for s in data['upcoming_shows'] + data['past_shows']])
         return render_template('pages/show_artist.html', artist=data)
     except Exception as err:
         if getattr(err, 'code', None) == 500:
@@ -334,7 +346,7 @@ def show_artist(artist_id):
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
     try:
@@ -351,15 +363,19 @@ def edit_artist(artist_id):
             print(err)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     artist = Artist.query.get_or_404(artist_id)
+    old_name = artist.name
     form = ArtistForm(request.form, meta={'csrf': False}, obj=artist)
     if form.validate():
         try:
             form.populate_obj(artist)
             db.session.commit()
-            return redirect(url_for('show_artist', artist_id=artist_id))
+            page_cache.invalidate(artist_tag(artist_id))
+            if form.name.data != old_name:
+                page_cache.invalidate('artists')
+            return redirect(url_for('.show_artist', artist_id=artist_id))
         except Exception as err:
             db.session.rollback()
             if getattr(err, 'code', None) == 500:
@@ -379,7 +395,7 @@ def edit_artist_submission(artist_id):
                                artist=artist)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
     try:
@@ -396,15 +412,19 @@ def edit_venue(venue_id):
         db.session.close()
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     venue = Venue.query.get_or_404(venue_id)
+    old_area = (venue.state, venue.city)
     form = VenueForm(request.form, meta={'csrf': False}, obj=venue)
     if form.validate():
         try:
             form.populate_obj(venue)
             db.session.commit()
-            return redirect(url_for('show_venue', venue_id=venue_id))
+            page_cache.invalidate(venue_tag(venue_id))
+            if (form.state.data, form.city.data) != old_area:
+                page_cache.invalidate('venues')
+            return redirect(url_for('.show_venue', venue_id=venue_id))
         except Exception as err:
             db.session.rollback()
             if getattr(err, 'code', None) == 500:
@@ -425,13 +445,13 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     form = ArtistForm(request.form, meta={'csrf': False})
@@ -451,8 +471,9 @@ def create_artist_submission():
             )
             db.session.add(artist)
             db.session.commit()
+            page_cache.invalidate('artists')
             flash('Artist ' + form.name.data + ' was successfully listed!')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         except Exception as err:
             db.session.rollback()
             flash(f'An error occurred. Artist {form.name.data} could not be listed.')
@@ -474,20 +495,26 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
+@conditional(catalog_validator)
+@page_cache.cached(tags=['shows'])
 def shows():
-    # displays list of shows at /shows
+    # displays list of shows at /shows, optionally for a date range and area
     try:
-        shows_list = Show.query.all()
-        data = [{
-            'venue_id': i.venue_id,
-            'venue_name': i.venues.name,
-            'artist_id': i.artist_id,
-            'artist_name': i.artists.name,
-            'artist_image_link': i.artists.image_link,
-            'start_time': str(i.start_time)
-        } for i in shows_list]
-        return render_template('pages/shows.html', shows=data)
+        filter_error = None
+        try:
+            calendar = show_filter(request.args)
+        except ValueError as err:
+            calendar, filter_error = None, str(err)
+        page = show_page(**page_args(request.args), show_filter=calendar)
+        days = show_day_counts(calendar) if calendar else []
+        for show in page.items:
+            tag_page(venue_tag(show['venue_id']), artist_tag(show['artist_id']))
+        context = dict(shows=page.items, page=page, days=days,
+                       filter_error=filter_error)
+        if current_app.config.get('STREAM_SHOWS'):
+            return Response(stream_template('pages/shows.html', **context))
+        return render_template('pages/shows.html', **context)
     except Exception as err:
         if getattr(err, 'code', None) == 500:
             server_error(abort(500))
@@ -495,14 +522,14 @@ def shows():
             print(err)
 
 
-@app.route('/shows/create')
+@bp.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
     form = ShowForm(request.form, meta={'csrf': False})
     if form.validate():
@@ -514,8 +541,10 @@ def create_show_submission():
             )
             db.session.add(show)
             db.session.commit()
+            page_cache.invalidate('shows', venue_tag(form.venue_id.data),
+                                  artist_tag(form.artist_id.data))
             flash('Show was successfully listed!')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         except Exception as err:
             db.session.rollback()
             flash('An error occurred. Show could not be listed.')
@@ -535,36 +564,109 @@ def create_show_submission():
         return render_template('forms/new_show.html', form=form)
 
 
-@app.errorhandler(404)
+def _rejected_csv(rejected):
+    # The rejected rows, with their header, for the operator to fix.
+    fields = [f for f in rejected[0][2] if f is not None]
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fields, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(row for _, _, row in rejected)
+    return out.getvalue()
+
+
+@bp.route('/shows/batch')
+def create_show_batch():
+    form = ShowBatchForm()
+    return render_template('forms/new_show_batch.html', form=form,
+                           rejected=[])
+
+
+@bp.route('/shows/batch', methods=['POST'])
+def create_show_batch_submission():
+    form = ShowBatchForm(request.form, meta={'csrf': False})
+    if not form.validate():
+        message = []
+        for field, err in form.errors.items():
+            message.append(field + ' ' + '|'.join(err))
+        flash('Errors ' + str(message))
+        return render_template('forms/new_show_batch.html', form=form,
+                               rejected=[])
+    try:
+        report, _ = create_show_batch(
+            read_rows(io.StringIO(form.rows.data), 'csv'), form.atomic.data)
+    except ValueError as err:
+        flash(str(err))
+        return render_template('forms/new_show_batch.html', form=form,
+                               rejected=[])
+    except Exception as err:
+        db.session.rollback()
+        flash('An error occurred. Shows could not be listed.')
+        if getattr(err, 'code', None) == 500:
+            server_error(abort(500))
+        else:
+            print(err)
+        return render_template('forms/new_show_batch.html', form=form,
+                               rejected=[])
+    finally:
+        db.session.close()
+    if not report.rejected:
+        flash(f'{report.loaded} shows were successfully listed!')
+        return redirect(url_for('.index'))
+    if report.loaded:
+        flash(f'Listed {report.loaded} of {report.read} shows; the '
+              f'{len(report.rejected)} rows below were not listed.')
+        form.rows.data = _rejected_csv(report.rejected)
+    else:
+        flash(f'No shows were listed; {len(report.rejected)} rows have '
+              f'errors.')
+    return render_template('forms/new_show_batch.html', form=form,
+                           rejected=report.rejected)
+
+
+@bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(job.as_dict())
+
+
+@bp.route('/_stats/pool')
+def pool_status():
+    # live connection pool numbers for this worker
+    return jsonify(pool_stats(db.engine))
+
+
+@bp.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint; totals are per worker process
+    pool = [(f'fyyur_pool_{key}', f'Connection pool {key}.', value)
+            for key, value in pool_stats(db.engine).items()
+            if isinstance(value, (int, float))]
+    return Response(request_metrics.registry.render(pool),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
 # Default port:
 # if __name__ == '__main__':
-#     app.run()
+#     create_app().run()
 
 # Or specify port manually:
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
@@ -0,0 +1,267 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for, \
+    Response
+from flask.cli import with_appcontext
+
+# ----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+# `flask assets build` concatenates and minifies the BUNDLES, copies the
+# standalone FILES, and writes each under static/dist/ with a content hash
+# in its name, next to .gz and .br copies. static/dist/manifest.json maps
+# every logical name to its hashed file. Templates call asset_url(name):
+# with a manifest it points at the hashed file, which is served with
+# far-future immutable cache headers and, when the client accepts it, as
+# the precompressed copy. Without a build, bundles are concatenated on each
+# request and files are served from their source paths, so a fresh
+# checkout works as before.
+#
+# dist/ sits at the same depth as css/, so relative url()s in the bundled
+# stylesheets keep resolving.
+# ----------------------------------------------------------------------------#
+
+ASSETS_DIST = 'dist'
+ASSETS_MANIFEST = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Ordered as the templates used to load them.
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css',
+                 'css/layout.main.css',
+                 'css/main.css',
+                 'css/main.responsive.css',
+                 'css/main.quickfix.css'],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js',
+                'js/libs/moment.min.js',
+                'js/script.js'],
+    'main.js': ['js/libs/bootstrap-3.1.1.min.js',
+                'js/plugins.js',
+                'js/venues.js',
+                'js/typeahead.js'],
+}
+
+# Served on their own: the CDN fallback for jQuery and the IE8 shim.
+FILES = ['js/libs/jquery-1.11.1.min.js',
+         'js/libs/respond-1.4.2.min.js',
+         'img/front-splash.jpg']
+
+# Precompressed copies, best first, as (Accept-Encoding token, suffix).
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class Assets:
+    """Flask extension: asset_url() for templates and the static view."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['assets'] = {'manifest': None, 'hashed': None,
+                                    'lock': threading.Lock()}
+        app.add_template_global(asset_url)
+        app.view_functions['static'] = send_static
+
+    def manifest(self, app):
+        """{logical name: hashed path} from the last build ({} if none)."""
+        state = app.extensions['assets']
+        if state['manifest'] is None:
+            with state['lock']:
+                path = os.path.join(app.static_folder, ASSETS_DIST,
+                                    ASSETS_MANIFEST)
+                try:
+                    with open(path) as manifest:
+                        state['manifest'] = json.load(manifest)
+                except FileNotFoundError:
+                    state['manifest'] = {}
+                state['hashed'] = set(state['manifest'].values())
+        return state['manifest']
+
+    def reload(self, app):
+        app.extensions['assets']['manifest'] = None
+
+
+assets = Assets()
+
+
+def asset_url(name):
+    """URL of a bundle or static file, fingerprinted once it is built."""
+    app = current_app._get_current_object()
+    hashed = assets.manifest(app).get(name)
+    if hashed is not None:
+        return url_for('static', filename=hashed)
+    if name in BUNDLES:
+        return url_for('static', filename=f'{ASSETS_DIST}/{name}')
+    return url_for('static', filename=name)
+
+
+def send_static(filename):
+    """The static view: hashed build output is served precompressed and
+    cached for a year; unbuilt bundles are concatenated on the fly."""
+    app = current_app._get_current_object()
+    assets.manifest(app)
+    if filename in app.extensions['assets']['hashed']:
+        return _send_hashed(app, filename)
+    name = filename[len(ASSETS_DIST) + 1:] \
+        if filename.startswith(ASSETS_DIST + '/') else None
+    if name in BUNDLES:
+        body = bundle_source(app.static_folder, name)
+        return Response(body, mimetype=mimetypes.guess_type(name)[0])
+    return app.send_static_file(filename)
+
+
+def _send_hashed(app, filename):
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.exists(
+                os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder,
+                                           filename + suffix,
+                                           mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename,
+                                       max_age=IMMUTABLE_MAX_AGE)
+    response.headers['Cache-Control'] = \
+        f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+
+def bundle_source(static_folder, name):
+    """The bundle's source files concatenated, unminified."""
+    parts = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(static_folder, path), encoding='utf-8') as f:
+            parts.append(f.read())
+    # ';' keeps a script without a trailing semicolon from running into
+    # the next one.
+    return ('\n' if name.endswith('.css') else '\n;\n').join(parts)
+
+
+def minify(name, source):
+    """Minify CSS with rcssmin and JS with rjsmin, keeping /*! notices."""
+    try:
+        if name.endswith('.css'):
+            from rcssmin import cssmin
+            return cssmin(source, keep_bang_comments=True)
+        from rjsmin import jsmin
+        return jsmin(source, keep_bang_comments=True)
+    except ImportError:
+        raise RuntimeError('flask assets build requires the rcssmin and '
+                           'rjsmin packages')
+
+
+def hashed_name(name, content):
+    stem, ext = posixpath.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def compressed(content):
+    """{suffix: bytes} for each precompressed copy worth serving.
+
+    A copy that saves less than a tenth, as for images, is dropped.
+    """
+    try:
+        import brotli
+    except ImportError:
+        raise RuntimeError('flask assets build requires the brotli package')
+    copies = {'.gz': gzip.compress(content, compresslevel=9, mtime=0),
+              '.br': brotli.compress(content, quality=11)}
+    return {suffix: data for suffix, data in copies.items()
+            if len(data) < len(content) * 0.9}
+
+
+def build(static_folder):
+    """Write every bundle and file into dist/ and return the manifest."""
+    dist = os.path.join(static_folder, ASSETS_DIST)
+    outputs = {}
+    for name in BUNDLES:
+        outputs[name] = minify(name, bundle_source(static_folder, name)) \
+            .encode('utf-8')
+    for name in FILES:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            outputs[name] = f.read()
+    manifest = {}
+    for name, content in outputs.items():
+        target = hashed_name(name, content)
+        path = os.path.join(dist, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        for suffix, data in compressed(content).items():
+            with open(path + suffix, 'wb') as f:
+                f.write(data)
+        manifest[name] = f'{ASSETS_DIST}/{target}'
+    # Written last, so a worker never reads a manifest whose files are
+    # still missing.
+    temporary = os.path.join(dist, ASSETS_MANIFEST + '.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(dist, ASSETS_MANIFEST))
+    return manifest
+
+
+def stale_files(static_folder, manifest):
+    """Files in dist/ that the manifest no longer refers to."""
+    dist = os.path.join(static_folder, ASSETS_DIST)
+    keep = {ASSETS_MANIFEST}
+    for hashed in manifest.values():
+        target = hashed[len(ASSETS_DIST) + 1:]
+        keep.update(target + suffix for suffix in ('', '.gz', '.br'))
+    for root, _, files in os.walk(dist):
+        for file in files:
+            path = os.path.relpath(os.path.join(root, file), dist)
+            if path.replace(os.sep, '/') not in keep:
+                yield os.path.join(root, file)
+
+
+# ----------------------------------------------------------------------------#
+# CLI.
+# ----------------------------------------------------------------------------#
+
+@click.group('assets')
+def assets_command():
+    """Build fingerprinted, precompressed static assets."""
+
+
+@assets_command.command('build')
+@with_appcontext
+def build_command():
+    """Bundle, minify, hash and precompress static/ into static/dist/."""
+    app = current_app._get_current_object()
+    manifest = build(app.static_folder)
+    assets.reload(app)
+    for name, hashed in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(app.static_folder, hashed))
+        click.echo(f'{name:<34} {hashed} ({size} bytes)')
+
+
+@assets_command.command('clean')
+@with_appcontext
+def clean_command():
+    """Delete build output the current manifest does not use.
+
+    Run it once every worker serves pages from the current build; earlier
+    pages may still refer to the previous files until then.
+    """
+    app = current_app._get_current_object()
+    removed = 0
+    for path in stale_files(app.static_folder, assets.manifest(app)):
+        os.remove(path)
+        removed += 1
+    click.echo(f'Removed {removed} file(s).')
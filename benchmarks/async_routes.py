@@ -0,0 +1,111 @@
+"""Compare the sync read routes with their /async twins under concurrency.
+
+    python -m benchmarks.seed --reset --venues 200 --artists 500 --shows 20000
+    python -m benchmarks.async_routes --concurrency 8 32 128 --iterations 200
+
+Serves the app on a local port and, at each --concurrency level, has that
+many clients request the listing, search and detail pages, first through
+the sync routes and then through /async. Detail pages alternate between
+the hottest venue/artist and random ones. Prints req/s and p50/p99 per
+route and path.
+
+Before timing, every page is rendered through both paths and compared;
+the script exits non-zero if an /async page differs from its sync twin
+(beyond its own links) or if any request answers with an error.
+"""
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from aio import async_db
+from benchmarks.load import app, catalog_ids, run_clients
+from benchmarks.seed import CITIES
+from benchmarks.util import percentile, serve
+
+
+def pages(ids, rng, iterations):
+    """(label, method, path, form data) requests against the sync routes."""
+    for iteration in range(iterations):
+        hot = iteration % 2 == 0
+        city, state = rng.choice(CITIES)
+        venue = ids['hot_venue_id'] if hot else rng.choice(ids['venue_id'])
+        artist = ids['hot_artist_id'] if hot else rng.choice(ids['artist_id'])
+        term = {'search_term': rng.choice(['the', 'music', 'venue 1'])}
+        yield 'venues', 'GET', '/venues', None
+        yield 'artists', 'GET', '/artists', None
+        yield 'shows', 'GET', '/shows', None
+        area = urlencode({'city': city, 'state': state})
+        yield 'shows in a city', 'GET', f'/shows?{area}', None
+        yield 'venue', 'GET', f'/venues/{venue}', None
+        yield 'artist', 'GET', f'/artists/{artist}', None
+        yield 'search venues', 'POST', '/venues/search', term
+        yield 'search artists', 'POST', '/artists/search', term
+
+
+def compare(ids):
+    """Render each kind of page through both paths; return the mismatches."""
+    client = app.test_client()
+    mismatches = 0
+    seen = set()
+    for label, method, path, data in pages(ids, random.Random(0), 2):
+        if label in seen:
+            continue
+        seen.add(label)
+        sync = client.open(path, method=method, data=data)
+        aio = client.open('/async' + path, method=method, data=data)
+        same = sync.status_code == aio.status_code and \
+            sync.get_data(as_text=True) == \
+            aio.get_data(as_text=True).replace('"/async/', '"/')
+        print(f'{label:<16} {"same" if same else "DIFFERS"}')
+        mismatches += not same
+    return mismatches
+
+
+def run(base, requests, concurrency, prefix):
+    work = [(method, label, prefix + path, data)
+            for label, method, path, data in requests]
+    started = time.perf_counter()
+    results = run_clients(base, work, concurrency)
+    return results, time.perf_counter() - started
+
+
+def report(concurrency, prefix, results, wall):
+    by_label = defaultdict(list)
+    errors = 0
+    for method, label, status, elapsed in results:
+        by_label[label].append(elapsed * 1000)
+        errors += status >= 400
+    name = prefix or 'sync'
+    for label, samples in sorted(by_label.items()):
+        print(f'{concurrency:>5} {name:<6} {label:<16} {len(samples):>6} '
+              f'{percentile(samples, 50):>8.2f} {percentile(samples, 99):>8.2f}')
+    print(f'{concurrency:>5} {name:<6} {"all":<16} {len(results):>6} '
+          f'{len(results) / wall:>8.1f} req/s, {errors} errors')
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[8, 32, 128])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    ids = catalog_ids()
+    if not ids['venue_id'] or not ids['artist_id']:
+        print('seed the database first (see benchmarks.seed)')
+        sys.exit(1)
+    failures = compare(ids)
+    requests = list(pages(ids, random.Random(args.seed), args.iterations))
+    print(f'{"conc":>5} {"path":<6} {"route":<16} {"n":>6} {"p50":>8} '
+          f'{"p99":>8}')
+    with serve(app) as base:
+        for concurrency in args.concurrency:
+            for prefix in ('', '/async'):
+                results, wall = run(base, requests, concurrency, prefix)
+                failures += report(concurrency, prefix, results, wall)
+    async_db.dispose(app)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,63 @@
+"""Measure the work skipped by conditional GETs on listing and detail pages.
+
+    python -m benchmarks.conditional_get --iterations 50
+
+For each route a first request fetches the ETag, then the route is requested
+again with and without If-None-Match. Reports latency, SQL statements and
+templates rendered per request. tests/test_conditional_get.py asserts that
+a 304 renders no template and issues only the validator query.
+"""
+import argparse
+
+from flask import template_rendered
+from sqlalchemy import select
+
+from app import create_app
+from models import db, Venue, Artist
+from benchmarks.util import StatementCounter, timer, report
+
+app = create_app({'CACHE_BACKEND': 'null'})
+
+
+def measure(label, path, iterations, headers=None):
+    client = app.test_client()
+    rendered = []
+
+    def on_render(sender, template, context, **extra):
+        rendered.append(template.name)
+
+    samples = []
+    statuses = set()
+    with app.app_context():
+        engine = db.engine
+    with template_rendered.connected_to(on_render, app):
+        with StatementCounter(engine) as counter:
+            for _ in range(iterations):
+                with timer(samples):
+                    response = client.get(path, headers=headers)
+                    response.get_data()
+                statuses.add(response.status_code)
+    report(f'{label} {sorted(statuses)}', samples, counter.count, iterations)
+    return counter.count / iterations, len(rendered) / iterations
+
+
+def main(iterations):
+    with app.app_context():
+        venue_id = db.session.scalar(select(Venue.id).limit(1))
+        artist_id = db.session.scalar(select(Artist.id).limit(1))
+    paths = ['/venues', '/artists', '/shows',
+             f'/venues/{venue_id}', f'/artists/{artist_id}']
+    for path in paths:
+        etag = app.test_client().get(path).headers.get('ETag')
+        measure(f'{path} full', path, iterations)
+        statements, templates = measure(f'{path} 304', path, iterations,
+                                        {'If-None-Match': etag})
+        print(f'    304 path: {statements:.2f} statements, '
+              f'{templates:.2f} templates per request')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+    main(args.iterations)
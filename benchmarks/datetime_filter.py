@@ -0,0 +1,74 @@
+"""Render pages/shows.html with synthetic show tiles, timing the `datetime`
+filter against the previous dateutil + babel.dates.format_datetime one.
+
+    python -m benchmarks.datetime_filter --tiles 10000 --runs 5
+
+No database is needed: tiles are built in memory and rendered inside a
+request context.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from flask import render_template
+
+from app import create_app
+from queries import Page
+from benchmarks.util import timer, percentile
+
+app = create_app({'CACHE_BACKEND': 'null', 'SQLALCHEMY_ENGINE_OPTIONS': {},
+                  'FRAGMENT_CACHE_MAX_ENTRIES': 0})
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def tiles(count):
+    start = datetime(2030, 1, 1, 20, 0)
+    return [{'venue_id': i % 200, 'venue_name': f'Venue {i % 200}',
+             'artist_id': i % 500, 'artist_name': f'Artist {i % 500}',
+             'artist_image_link': 'https://example.com/a.jpg',
+             'start_time': start + timedelta(hours=i)}
+            for i in range(count)]
+
+
+def render(shows):
+    page = Page(shows, None, None, len(shows))
+    return render_template('pages/shows.html', shows=shows, page=page)
+
+
+def measure(label, shows, runs):
+    samples = []
+    for _ in range(runs):
+        with timer(samples):
+            html = render(shows)
+    print(f'{label:<28} n={runs:<4} p50={percentile(samples, 50):9.2f}ms '
+          f'max={max(samples):9.2f}ms')
+    return html
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tiles', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    native = tiles(args.tiles)
+    as_strings = [dict(t, start_time=str(t['start_time'])) for t in native]
+    with app.test_request_context('/shows'):
+        current = app.jinja_env.filters['datetime']
+        new = measure('datetime (native values)', native, args.runs)
+        app.jinja_env.filters['datetime'] = legacy_format_datetime
+        try:
+            old = measure('legacy (string round trip)', as_strings, args.runs)
+        finally:
+            app.jinja_env.filters['datetime'] = current
+    if new != old:
+        raise SystemExit('rendered output differs from the legacy filter')
+    print('rendered output identical')
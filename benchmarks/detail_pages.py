@@ -0,0 +1,67 @@
+"""Compare the venue/artist detail query paths against a seeded database.
+
+    python -m benchmarks.seed
+    python -m benchmarks.detail_pages --iterations 200
+
+`legacy` is the previous get_or_404 + two array_agg implementation, kept
+here only as the baseline; `single` is queries.venue_detail/artist_detail.
+"""
+import argparse
+import random
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app import create_app
+from models import db, Venue, Artist, Show
+from queries import venue_detail, artist_detail
+from benchmarks.util import StatementCounter, timer, report
+
+app = create_app()
+
+
+def legacy_detail(model, other, fk, prefix, entity_id):
+    entity = db.session.get(model, entity_id)
+    data = dict((col, getattr(entity, col))
+                for col in entity.__table__.columns.keys())
+    for key, cond in (('upcoming', Show.start_time > datetime.now()),
+                      ('past', Show.start_time < datetime.now())):
+        row = db.session.execute(
+            select(func.array_agg(func.json_build_object(
+                f'{prefix}_id', other.id,
+                f'{prefix}_name', other.name,
+                f'{prefix}_image_link', other.image_link,
+                'start_time', Show.start_time)),
+                func.count(Show.id))
+            .select_from(other).join(Show)
+            .where(fk == entity_id, cond)).first()
+        data[f'{key}_shows'] = row[0] or []
+        data[f'{key}_shows_count'] = row[1]
+    return data
+
+
+def run(label, fn, ids, iterations):
+    samples = []
+    with StatementCounter(db.engine) as counter:
+        for _ in range(iterations):
+            entity_id = random.choice(ids)
+            with timer(samples):
+                fn(entity_id)
+            db.session.remove()
+    report(label, samples, counter.count, iterations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    random.seed(1613)
+    with app.app_context():
+        venue_ids = db.session.scalars(select(Venue.id)).all()
+        artist_ids = db.session.scalars(select(Artist.id)).all()
+        run('venue legacy', lambda i: legacy_detail(
+            Venue, Artist, Show.venue_id, 'artist', i), venue_ids, args.iterations)
+        run('venue single', venue_detail, venue_ids, args.iterations)
+        run('artist legacy', lambda i: legacy_detail(
+            Artist, Venue, Show.artist_id, 'venue', i), artist_ids, args.iterations)
+        run('artist single', artist_detail, artist_ids, args.iterations)
@@ -0,0 +1,95 @@
+"""EXPLAIN every statement issued by the read routes and flag missing indexes.
+
+    python -m benchmarks.explain_routes [--allow artists] [--verbose]
+
+Each route is requested through the test client while its SQL is captured.
+Every statement is then explained with enable_seqscan off, so a sequential
+scan left in the plan means no usable index exists for it. The script exits
+non-zero when that happens on a table that is not --allow'ed.
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import event, select, text
+
+from app import create_app
+from models import db, Venue, Artist
+
+app = create_app({'CACHE_BACKEND': 'null'})
+
+
+def routes():
+    with app.app_context():
+        venue_id = db.session.scalar(select(Venue.id).limit(1))
+        artist_id = db.session.scalar(select(Artist.id).limit(1))
+    yield 'GET', '/', None
+    yield 'GET', '/venues', None
+    yield 'GET', '/artists', None
+    yield 'GET', '/shows', None
+    if venue_id is not None:
+        yield 'GET', f'/venues/{venue_id}', None
+    if artist_id is not None:
+        yield 'GET', f'/artists/{artist_id}', None
+    yield 'POST', '/venues/search', {'search_term': 'music'}
+    yield 'POST', '/artists/search', {'search_term': 'band'}
+
+
+def capture(engine, method, path, data):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        app.test_client().open(path, method=method, data=data).get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def seq_scans(plan):
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(connection, statement, parameters):
+    connection.execute(text('SET LOCAL enable_seqscan = off'))
+    raw = connection.exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return plan[0]['Plan']
+
+
+def main(allowed, verbose):
+    failures = 0
+    with app.app_context():
+        engine = db.engine
+    for method, path, data in routes():
+        statements = capture(engine, method, path, data)
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                with connection.begin():
+                    plan = explain(connection, statement, parameters)
+                scans = [t for t in seq_scans(plan) if t not in allowed]
+                status = 'SEQ SCAN ' + ', '.join(scans) if scans else 'ok'
+                print(f'{method} {path:<22} {status}')
+                if verbose or scans:
+                    print('    ' + ' '.join(statement.split())[:300])
+                failures += bool(scans)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--allow', action='append', default=[],
+                        help='table allowed to be sequentially scanned')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    sys.exit(main(set(args.allow), args.verbose))
@@ -0,0 +1,60 @@
+"""Render pages/shows.html with and without {% cache %} show cards.
+
+    python -m benchmarks.fragment_cache --tiles 2000 --runs 20
+
+Times renders with the fragment cache off, cold (every card rendered and
+stored) and warm, plus a warm page where --churn of the cards are new
+shows. No database is needed: tiles are built in memory as in
+benchmarks.datetime_filter. Exits non-zero if any cached render differs
+from the uncached one.
+"""
+import argparse
+from datetime import timedelta
+
+from cache import MemoryCache
+from benchmarks.datetime_filter import app, tiles, render
+from benchmarks.util import timer, percentile
+
+
+def measure(label, shows, runs, before_run=None):
+    samples = []
+    for _ in range(runs):
+        if before_run:
+            before_run()
+        with timer(samples):
+            html = render(shows)
+    print(f'{label:<24} n={runs:<4} p50={percentile(samples, 50):9.2f}ms '
+          f'max={max(samples):9.2f}ms')
+    return html
+
+
+def churned(shows, fraction):
+    """A copy of `shows` where every 1/fraction-th card is a new show."""
+    step = max(1, round(1 / fraction)) if fraction else len(shows) + 1
+    return [dict(show, start_time=show['start_time'] + timedelta(minutes=1))
+            if i % step == 0 else show for i, show in enumerate(shows)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tiles', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--churn', type=float, default=0.1)
+    args = parser.parse_args()
+    shows = tiles(args.tiles)
+    fragments = MemoryCache(max(args.tiles * 2, 1), default_ttl=300)
+    outputs = []
+    with app.test_request_context('/shows'):
+        app.extensions['fragment_cache'] = None
+        outputs.append(measure('no fragment cache', shows, args.runs))
+        app.extensions['fragment_cache'] = fragments
+        outputs.append(measure('cold', shows, args.runs, fragments.clear))
+        outputs.append(measure('warm', shows, args.runs))
+        changed = churned(shows, args.churn)
+        app.extensions['fragment_cache'] = None
+        expected = render(changed)
+        app.extensions['fragment_cache'] = fragments
+        updated = measure(f'warm, {args.churn:.0%} new cards', changed, 1)
+    if len(set(outputs)) != 1 or updated != expected:
+        raise SystemExit('cached render differs from the uncached one')
+    print(f'rendered output identical; {len(fragments)} fragments cached')
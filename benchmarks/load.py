@@ -0,0 +1,276 @@
+"""Drive every route and report throughput, latency and SQL per route.
+
+    python -m benchmarks.seed --reset --venues 200 --artists 500 --shows 20000
+    python -m benchmarks.load --iterations 50 [--writes] [--wsgi --threads 8]
+
+Each route in the URL map is requested --iterations times with ids picked
+from the seeded catalog: the hottest venue/artist (most shows) and random
+ones. By default requests go through the Flask test client one at a time.
+--wsgi serves the app on a local port and has --threads clients hit it
+concurrently. Write routes (create, edit, delete) are only exercised with
+--writes, against rows the run creates itself.
+
+SQL statement counts come from the app's own request metrics, so they are
+per route whichever mode is used. The script exits non-zero if any route
+answers with a 5xx status or if a route goes unexercised.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from sqlalchemy import func, select
+
+from app import create_app
+from models import db, Venue, Artist, Show, Job
+from benchmarks.seed import CITIES, GENRES
+from benchmarks.util import percentile, serve
+
+app = create_app({'CACHE_BACKEND': 'null', 'REQUEST_LOG': ''})
+
+# Endpoints that are only timed with --writes.
+WRITE_ENDPOINTS = {'main.create_venue_submission',
+                   'main.create_artist_submission',
+                   'main.create_show_submission',
+                   'main.create_show_batch_submission',
+                   'api.create_show_batch',
+                   'main.edit_venue_submission',
+                   'main.edit_artist_submission',
+                   'main.delete_venue'}
+SKIPPED_ENDPOINTS = {'static'}
+
+
+def catalog_ids():
+    with app.app_context():
+        def hottest(fk):
+            return db.session.scalar(select(fk).group_by(fk)
+                                     .order_by(func.count().desc()).limit(1))
+        return {
+            'venue_id': db.session.scalars(select(Venue.id)).all(),
+            'artist_id': db.session.scalars(select(Artist.id)).all(),
+            'hot_venue_id': hottest(Show.venue_id),
+            'hot_artist_id': hottest(Show.artist_id),
+            'job_id': db.session.scalar(select(func.max(Job.id))),
+        }
+
+
+def venue_form(rng, n):
+    city, state = rng.choice(CITIES)
+    return {'name': f'Load Venue {n}', 'city': city, 'state': state,
+            'address': f'{n} Load St', 'phone': '123-123-1234',
+            'genres': rng.sample(GENRES, 2),
+            'facebook_link': f'https://facebook.com/loadvenue{n}'}
+
+
+def artist_form(rng, n):
+    city, state = rng.choice(CITIES)
+    return {'name': f'Load Artist {n}', 'city': city, 'state': state,
+            'phone': '123-123-1234', 'genres': rng.sample(GENRES, 2),
+            'facebook_link': f'https://facebook.com/loadartist{n}'}
+
+
+def requests_for(rule, ids, rng, iteration, created):
+    """(method, path, form data) for one request against `rule`, or None."""
+    methods = sorted(rule.methods - {'HEAD', 'OPTIONS'})
+    args = {}
+    for name in rule.arguments:
+        if name in ('venue_id', 'artist_id'):
+            pool = created[name] if rule.endpoint in WRITE_ENDPOINTS \
+                else ids[name]
+            if not pool:
+                return None
+            hot = ids[f'hot_{name}'] if rule.endpoint not in WRITE_ENDPOINTS \
+                else None
+            args[name] = hot if hot and iteration % 2 == 0 else rng.choice(pool)
+        elif name == 'job_id':
+            # a finished delete_venue job when --writes ran before,
+            # otherwise a 404
+            args[name] = ids['job_id'] or 0
+        elif name == 'kind':
+            # shows can be millions of rows; one export of it is a job for
+            # flask export, not a latency sample
+            args[name] = rng.choice(['venues', 'artists'])
+    path = rule.build(args, append_unknown=False)[1]
+    method = methods[0]
+    data = None
+    if rule.endpoint.endswith(('.search_venues', '.search_artists')):
+        data = {'search_term': rng.choice(['the', 'music', 'venue 1', 'artist'])}
+    elif rule.endpoint in ('main.shows', 'aio.shows') and iteration % 3 == 1:
+        city, state = rng.choice(CITIES)
+        path += '?' + urlencode({'city': city, 'state': state})
+    elif rule.endpoint in ('main.create_venue_submission',
+                           'main.edit_venue_submission'):
+        data = venue_form(rng, iteration)
+    elif rule.endpoint in ('main.create_artist_submission',
+                           'main.edit_artist_submission'):
+        data = artist_form(rng, iteration)
+    elif rule.endpoint in ('api.venue_names', 'api.artist_names'):
+        path += '?' + urlencode({'q': rng.choice(['the', 'mu', 'venue 1'])})
+    elif rule.endpoint == 'main.create_show_submission':
+        data = {'venue_id': str(rng.choice(ids['venue_id'])),
+                'artist_id': str(rng.choice(ids['artist_id'])),
+                'start_time': '2031-06-01 20:00:00'}
+    elif rule.endpoint in ('main.create_show_batch_submission',
+                           'api.create_show_batch'):
+        shows = [{'venue_id': rng.choice(ids['venue_id']),
+                  'artist_id': rng.choice(ids['artist_id']),
+                  'start_time': f'2032-{iteration % 12 + 1:02}-01 {hour:02}:00:00'}
+                 for hour in range(20)]
+        if rule.endpoint == 'api.create_show_batch':
+            # sent as the raw request body
+            data = json.dumps({'shows': shows})
+        else:
+            data = {'rows': 'artist_id,venue_id,start_time\n' + ''.join(
+                f"{show['artist_id']},{show['venue_id']},{show['start_time']}\n"
+                for show in shows)}
+    return method, path, data
+
+
+def plan(iterations, writes, seed_value):
+    """The request list: every exercisable rule, `iterations` times each."""
+    rng = random.Random(seed_value)
+    ids = catalog_ids()
+    created = {'venue_id': [], 'artist_id': [], 'doomed': []}
+    if writes:
+        created = create_targets(iterations)
+    rules = [r for r in app.url_map.iter_rules()
+             if r.endpoint not in SKIPPED_ENDPOINTS
+             and (writes or r.endpoint not in WRITE_ENDPOINTS)]
+    work, skipped = [], []
+    for rule in rules:
+        for iteration in range(iterations):
+            request = requests_for(rule, ids, rng, iteration, created)
+            if request is None:
+                skipped.append(rule.rule)
+                break
+            if rule.endpoint == 'main.delete_venue':
+                # each delete gets a venue nothing else touches
+                request = (request[0], f'/venues/{created["doomed"].pop()}',
+                           None)
+            work.append((request[0], rule.rule, request[1], request[2]))
+    return work, skipped
+
+
+def create_targets(iterations):
+    """Venues/artists for the edit and delete routes to work on."""
+    rng = random.Random(0)
+    with app.app_context():
+        venues = [Venue(**dict(venue_form(rng, n), name=f'Load target {n}'))
+                  for n in range(iterations * 2)]
+        artists = [Artist(**artist_form(rng, n)) for n in range(iterations)]
+        db.session.add_all(venues + artists)
+        db.session.commit()
+        return {'venue_id': [v.id for v in venues[:iterations]],
+                'doomed': [v.id for v in venues[iterations:]],
+                'artist_id': [a.id for a in artists]}
+
+
+# ----------------------------------------------------------------------------#
+# Runners.
+# ----------------------------------------------------------------------------#
+
+def run_test_client(work):
+    client = app.test_client()
+    results = []
+    for method, rule, path, data in work:
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=data,
+                               content_type='application/json'
+                               if isinstance(data, str) else None)
+        response.get_data()
+        results.append((method, rule, response.status_code,
+                        time.perf_counter() - start))
+    return results
+
+
+def run_wsgi(work, threads):
+    with serve(app) as base:
+        return run_clients(base, work, threads)
+
+
+def run_clients(base, work, threads):
+    """Have `threads` clients send `work` to `base` over HTTP."""
+    results, lock = [], threading.Lock()
+    queue = list(reversed(work))
+
+    def client():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                method, rule, path, data = queue.pop()
+            headers = {}
+            if isinstance(data, str):
+                body = data.encode()
+                headers['Content-Type'] = 'application/json'
+            else:
+                body = urlencode(data, doseq=True).encode() if data else None
+            request = Request(base + path, data=body, method=method,
+                              headers=headers)
+            start = time.perf_counter()
+            try:
+                with urlopen(request) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as err:
+                status = err.code
+            elapsed = time.perf_counter() - start
+            with lock:
+                results.append((method, rule, status, elapsed))
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def summarize(results, wall):
+    registry = app.extensions['request_metrics'][0]
+    sql = dict(registry.sql_statements)
+    served = defaultdict(int)
+    for (method, route, _), count in registry.requests.items():
+        served[(method, route)] += count
+    by_route = defaultdict(list)
+    errors = 0
+    for method, rule, status, elapsed in results:
+        by_route[(method, rule)].append(elapsed * 1000)
+        errors += status >= 500
+    print(f'{"route":<40} {"n":>5} {"req/s":>8} {"p50":>8} {"p95":>8} '
+          f'{"p99":>8} {"sql/req":>8}')
+    for (method, rule), samples in sorted(by_route.items(), key=lambda i: i[0][1]):
+        statements = sql.get((method, rule), 0) / max(served[(method, rule)], 1)
+        rate = len(samples) / (sum(samples) / 1000) if sum(samples) else 0.0
+        print(f'{method + " " + rule:<40} {len(samples):>5} {rate:>8.1f} '
+              f'{percentile(samples, 50):>8.2f} {percentile(samples, 95):>8.2f} '
+              f'{percentile(samples, 99):>8.2f} {statements:>8.2f}')
+    print(f'{len(results)} requests in {wall:.2f}s '
+          f'({len(results) / wall:.1f} req/s overall), {errors} 5xx')
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--writes', action='store_true')
+    parser.add_argument('--wsgi', action='store_true')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    work, skipped = plan(args.iterations, args.writes, args.seed)
+    started = time.perf_counter()
+    if args.wsgi:
+        results = run_wsgi(work, args.threads)
+    else:
+        results = run_test_client(work)
+    errors = summarize(results, time.perf_counter() - started)
+    for rule in skipped:
+        print(f'not exercised: {rule} (no ids to use)')
+    sys.exit(1 if errors or skipped else 0)
@@ -0,0 +1,104 @@
+"""Seed the configured database with a deterministic synthetic catalog.
+
+    python -m benchmarks.seed --venues 200 --artists 500 --shows 20000
+    python -m benchmarks.seed --reset --shows 1000000 --skew 1.1
+
+Shows are spread over venues and artists with Zipf weights (--skew, 0 for
+uniform), so a few headline venues and artists get thousands of shows
+while most get a handful. Start times fall from two years before to one
+year after --base-date (default BASE_DATE, not today), so the same
+arguments always produce the same catalog on an empty (or --reset)
+database. Which shows count as upcoming still depends on the day the
+pages are read.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from itertools import accumulate
+
+from sqlalchemy import insert, select, delete
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Jazz', 'Pop', 'Punk', 'Rock n Roll', 'Soul']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Chicago', 'IL'), ('Seattle', 'WA'), ('Nashville', 'TN')]
+SHOW_BATCH = 50000
+BASE_DATE = datetime(2026, 10, 1)
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights giving rank k a share proportional to 1/k**skew."""
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def reset():
+    """Delete every show, artist and venue."""
+    for model in (Show, Artist, Venue):
+        db.session.execute(delete(model))
+    db.session.commit()
+
+
+def seed(venues=200, artists=500, shows=20000, seed_value=1613, skew=1.1,
+         base_date=BASE_DATE):
+    rng = random.Random(seed_value)
+
+    venue_rows = []
+    for i in range(venues):
+        city, state = rng.choice(CITIES)
+        venue_rows.append(dict(
+            name=f'Venue {i}', city=city, state=state,
+            address=f'{i} Main St', phone='123-123-1234',
+            image_link=f'https://example.com/venues/{i}.jpg',
+            facebook_link=f'https://facebook.com/venue{i}',
+            seeking_talent=bool(i % 2), genres=rng.sample(GENRES, 2)))
+    artist_rows = []
+    for i in range(artists):
+        city, state = rng.choice(CITIES)
+        artist_rows.append(dict(
+            name=f'Artist {i}', city=city, state=state, phone='123-123-1234',
+            image_link=f'https://example.com/artists/{i}.jpg',
+            facebook_link=f'https://facebook.com/artist{i}',
+            seeking_venue=bool(i % 3), genres=rng.sample(GENRES, 2)))
+
+    db.session.execute(insert(Venue), venue_rows)
+    db.session.execute(insert(Artist), artist_rows)
+    venue_ids = db.session.scalars(select(Venue.id).order_by(Venue.id)).all()
+    artist_ids = db.session.scalars(select(Artist.id).order_by(Artist.id)).all()
+    venue_weights = zipf_weights(len(venue_ids), skew)
+    artist_weights = zipf_weights(len(artist_ids), skew)
+    # Shows go in batches so a million-row seed stays within memory.
+    for offset in range(0, shows, SHOW_BATCH):
+        size = min(SHOW_BATCH, shows - offset)
+        show_venues = rng.choices(venue_ids, cum_weights=venue_weights, k=size)
+        show_artists = rng.choices(artist_ids, cum_weights=artist_weights, k=size)
+        show_rows = [dict(venue_id=venue_id, artist_id=artist_id,
+                          start_time=base_date + timedelta(hours=rng.randint(-24 * 730, 24 * 365)))
+                     for venue_id, artist_id in zip(show_venues, show_artists)]
+        db.session.execute(insert(Show), show_rows)
+    db.session.commit()
+    return venue_ids, artist_ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--venues', type=int, default=200)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=1613)
+    parser.add_argument('--base-date', type=datetime.fromisoformat,
+                        default=BASE_DATE,
+                        help='start times are spread around this date '
+                             '(YYYY-MM-DD)')
+    parser.add_argument('--reset', action='store_true',
+                        help='delete the existing catalog first')
+    args = parser.parse_args()
+    with create_app().app_context():
+        if args.reset:
+            reset()
+        seed(args.venues, args.artists, args.shows, args.seed, args.skew,
+             args.base_date)
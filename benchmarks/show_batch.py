@@ -0,0 +1,86 @@
+"""Compare listing a festival's shows one form POST at a time and as a batch.
+
+    python -m benchmarks.seed --reset --venues 200 --artists 500 --shows 20000
+    python -m benchmarks.show_batch --rows 500
+
+Builds --rows show slots for random seeded venues and artists, at times
+no seeded show uses, and lists them through POST /shows/create one by one
+and then through POST /api/v1/shows/batch. Prints wall time and SQL
+statements for each, then deletes the shows it created. Exits non-zero if
+either path lists fewer shows than it was given or if the batch takes
+more than four statements: one id lookup each for venues and artists,
+the double-booking check and the INSERT.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from models import db, Show
+from benchmarks.load import app, catalog_ids
+from benchmarks.util import StatementCounter
+
+
+def slots(ids, rng, count, start):
+    """Distinct (artist, venue, time) rows starting at `start`."""
+    return [{'artist_id': rng.choice(ids['artist_id']),
+             'venue_id': rng.choice(ids['venue_id']),
+             'start_time': (start + timedelta(hours=i))
+             .strftime('%Y-%m-%d %H:%M:%S')}
+            for i in range(count)]
+
+
+def shows_after(start):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(Show)
+                                 .where(Show.start_time >= start))
+
+
+def timed(label, submit, rows, start):
+    with app.app_context():
+        engine = db.engine
+    with StatementCounter(engine) as counter:
+        started = time.perf_counter()
+        submit(rows)
+        elapsed = time.perf_counter() - started
+    listed = shows_after(start)
+    print(f'{label:<12} rows={len(rows):<6} {elapsed * 1000:9.1f}ms '
+          f'sql={counter.count:<6} listed={listed}')
+    with app.app_context():
+        db.session.execute(delete(Show).where(Show.start_time >= start))
+        db.session.commit()
+    return listed, counter.count
+
+
+def one_by_one(rows):
+    client = app.test_client()
+    for row in rows:
+        client.post('/shows/create', data=row)
+
+
+def batch(rows):
+    app.test_client().post('/api/v1/shows/batch', json={'shows': rows})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    ids = catalog_ids()
+    if not ids['venue_id'] or not ids['artist_id']:
+        print('seed the database first (see benchmarks.seed)')
+        sys.exit(1)
+    start = datetime(2200, 1, 1)
+    rows = slots(ids, random.Random(args.seed), args.rows, start)
+    failures = 0
+    for label, submit in (('one by one', one_by_one), ('batch', batch)):
+        listed, statements = timed(label, submit, rows, start)
+        failures += listed != len(rows)
+        if submit is batch and statements > 4:
+            print(f'batch ran {statements} statements')
+            failures += 1
+    sys.exit(1 if failures else 0)
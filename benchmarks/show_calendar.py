@@ -0,0 +1,116 @@
+"""Time date-range/area queries on shows over a large catalog.
+
+    python -m benchmarks.seed --venues 2000 --artists 5000 --shows 1000000
+    python -m benchmarks.show_calendar --iterations 50
+
+Requests /shows and /api/v1/shows for random weekends in each seeded city
+and for whole weeks without an area, then EXPLAINs the listing and per-day
+count statements. Exits non-zero if either plan sequentially scans shows.
+"""
+import argparse
+import random
+import sys
+from datetime import timedelta
+
+from sqlalchemy import event, func, select
+from werkzeug.datastructures import MultiDict
+
+from app import create_app
+from models import db, Show
+from queries import show_filter, filter_shows, show_stmt, show_day_counts, \
+    SHOW_TILE_FIELDS
+from benchmarks.seed import CITIES
+from benchmarks.explain_routes import explain, seq_scans
+from benchmarks.util import StatementCounter, timer, report
+
+app = create_app({'CACHE_BACKEND': 'null'})
+
+
+def weekend(rng, first, last):
+    day = first + timedelta(days=rng.randint(0, (last - first).days))
+    friday = day + timedelta(days=(4 - day.weekday()) % 7)
+    return friday, friday + timedelta(days=2)
+
+
+def windows(rng, first, last, iterations):
+    for _ in range(iterations):
+        start, end = weekend(rng, first, last)
+        city, state = rng.choice(CITIES)
+        yield 'weekend in city', {'start': start.isoformat(),
+                                  'end': end.isoformat(),
+                                  'city': city, 'state': state}
+        yield 'week, anywhere', {'start': start.isoformat()}
+
+
+def run(path, label_args, engine):
+    client = app.test_client()
+    results = {}
+    for label, args in label_args:
+        samples, statements = results.setdefault(label, ([], [0]))
+        with StatementCounter(engine) as counter:
+            with timer(samples):
+                response = client.get(path, query_string=args)
+                response.get_data()
+        statements[0] += counter.count
+        if response.status_code != 200:
+            print(f'{path} {args} -> {response.status_code}')
+    for label, (samples, statements) in results.items():
+        report(f'{path} {label}', samples, statements[0], len(samples))
+
+
+def captured_sql(engine, work):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        work()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def check_plans(label, args):
+    with app.test_request_context():
+        calendar = show_filter(MultiDict(args))
+        listing = filter_shows(show_stmt(SHOW_TILE_FIELDS), calendar) \
+            .order_by(Show.start_time, Show.id).limit(50)
+        statements = captured_sql(db.engine, lambda: (
+            db.session.execute(listing).all(), show_day_counts(calendar)))
+        failures = 0
+        with db.engine.connect() as connection:
+            for name, (statement, parameters) in zip(('listing', 'day counts'),
+                                                     statements):
+                with connection.begin():
+                    plan = explain(connection, statement, parameters)
+                scans = 'shows' in seq_scans(plan)
+                print(f'plan {label} {name:<11} '
+                      f'{"SEQ SCAN shows" if scans else "ok"}')
+                failures += scans
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--min-shows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    with app.app_context():
+        engine = db.engine
+        count, first, last = db.session.execute(
+            select(func.count(Show.id), func.min(Show.start_time),
+                   func.max(Show.start_time))).one()
+    if count < args.min_shows:
+        print(f'only {count} shows seeded; results are not representative of '
+              f'{args.min_shows} (see benchmarks.seed)')
+    if not count:
+        sys.exit(1)
+    rng = random.Random(args.seed)
+    cases = list(windows(rng, first.date(), last.date(), args.iterations))
+    run('/shows', cases, engine)
+    run('/api/v1/shows', cases, engine)
+    failures = sum(check_plans(label, case) for label, case in cases[:2])
+    sys.exit(1 if failures else 0)
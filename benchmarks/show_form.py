@@ -0,0 +1,102 @@
+"""Time ShowForm validation for good ids, unknown ids and double-bookings.
+
+    python -m benchmarks.seed --reset --venues 200 --artists 500 --shows 20000
+    python -m benchmarks.show_form --runs 500
+
+Validates a show form --runs times per case and reports latency and SQL
+statements per validation, next to the previous path for an unknown id: an
+INSERT that fails on the foreign key and is rolled back. Nothing is
+committed. Exits non-zero if a case is accepted or rejected wrongly, or if
+a form with known ids costs more than the one double-booking probe.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from flask import request
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from forms import ShowForm
+from models import db, Venue, Artist, Show
+from references import known_ids
+from benchmarks.load import app
+from benchmarks.util import StatementCounter, timer, report
+
+
+def cases(rng):
+    """{label: (form data, expected to validate)} from the seeded catalog."""
+    venue_ids = db.session.scalars(select(Venue.id)).all()
+    artist_ids = db.session.scalars(select(Artist.id)).all()
+    booked = db.session.execute(select(Show.venue_id, Show.start_time)
+                                .limit(1)).first()
+    free = datetime(2100, 1, 1) + timedelta(minutes=rng.randrange(10 ** 6))
+    missing = db.session.scalar(select(func.max(Venue.id))) + 1
+    # Load the id arrays up front, as the first form in a process would.
+    known_ids(Venue), known_ids(Artist)
+
+    def data(venue_id, start_time, artist_id=None):
+        return {'venue_id': str(venue_id),
+                'artist_id': str(artist_id or rng.choice(artist_ids)),
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+    return {
+        'known ids': (data(rng.choice(venue_ids), free), True),
+        'unknown venue': (data(missing, free), False),
+        'unknown artist': (data(venue_ids[0], free,
+                                max(artist_ids) + 1), False),
+        'double-booked': (data(booked.venue_id, booked.start_time), False),
+    }
+
+
+def validate(label, form_data, expected, runs):
+    samples, failures = [], 0
+    with StatementCounter(db.engine) as counter:
+        for _ in range(runs):
+            with app.test_request_context('/shows/create', method='POST',
+                                          data=form_data):
+                with timer(samples):
+                    form = ShowForm(request.form, meta={'csrf': False})
+                    valid = form.validate()
+                db.session.remove()
+            failures += valid != expected
+    report(label, samples, counter.count, runs)
+    if expected and counter.count > runs:
+        print(f'{label}: {counter.count / runs:.2f} statements per form')
+        failures += 1
+    return failures
+
+
+def failed_insert(form_data, runs):
+    """The previous path: let the foreign key reject the show."""
+    samples = []
+    with StatementCounter(db.engine) as counter:
+        for _ in range(runs):
+            with timer(samples):
+                db.session.add(Show(venue_id=int(form_data['venue_id']),
+                                    artist_id=int(form_data['artist_id']),
+                                    start_time=datetime.fromisoformat(
+                                        form_data['start_time'])))
+                try:
+                    db.session.flush()
+                except IntegrityError:
+                    pass
+                db.session.rollback()
+    report('unknown venue (insert)', samples, counter.count, runs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    with app.app_context():
+        if not db.session.scalar(select(func.count()).select_from(Show)):
+            print('seed the database first (see benchmarks.seed)')
+            sys.exit(1)
+        checks = cases(random.Random(args.seed))
+        failures = 0
+        for label, (form_data, expected) in checks.items():
+            failures += validate(label, form_data, expected, args.runs)
+        failed_insert(checks['unknown venue'][0], args.runs)
+    sys.exit(1 if failures else 0)
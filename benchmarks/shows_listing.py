@@ -0,0 +1,52 @@
+"""Render /shows through the test client and guard its SQL statement count.
+
+Runs once rendering the page in full and once with STREAM_SHOWS, which
+streams the template output of the same, already fetched, page.
+
+    python -m benchmarks.shows_listing --iterations 20
+
+Exits non-zero if a request issues more than --max-statements statements
+(default 2: catalog_validator() and the page query), which is what happens
+if the route goes back to per-row lazy loads. tests/test_shows_listing.py
+makes the same check against SQLite.
+"""
+import argparse
+import sys
+
+from app import create_app
+from models import db
+from benchmarks.util import StatementCounter, timer, report
+
+app = create_app({'CACHE_BACKEND': 'null'})
+
+
+def run(label, path, iterations, max_statements):
+    client = app.test_client()
+    samples = []
+    worst = 0
+    with app.app_context():
+        engine = db.engine
+    for _ in range(iterations):
+        with StatementCounter(engine) as counter:
+            with timer(samples):
+                response = client.get(path)
+                response.get_data()
+        worst = max(worst, counter.count)
+    report(label, samples, worst * iterations, iterations)
+    if worst > max_statements:
+        print(f'{label} issued {worst} statements per request '
+              f'(limit {max_statements})')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--max-statements', type=int, default=2)
+    args = parser.parse_args()
+    status = run('/shows', '/shows', args.iterations, args.max_statements)
+    app.config['STREAM_SHOWS'] = True
+    status |= run('/shows (streamed output)', '/shows', args.iterations,
+                  args.max_statements)
+    sys.exit(status)
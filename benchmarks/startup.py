@@ -0,0 +1,44 @@
+"""Track boot time: module import, create_app() and the first request.
+
+    python -m benchmarks.startup --runs 10 [--path /venues]
+
+Every run happens in a fresh interpreter so imports are cold. The default
+path, the home page, needs no database.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+status = application.test_client().get(sys.argv[1]).status_code
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1,
+                  "first_request": t3 - t2, "status": status}))
+'''
+
+
+def run_once(path):
+    out = subprocess.run([sys.executable, '-c', PROBE, path], check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/')
+    args = parser.parse_args()
+    results = [run_once(args.path) for _ in range(args.runs)]
+    for phase in ('import', 'create_app', 'first_request'):
+        samples = [r[phase] * 1000 for r in results]
+        print(f'{phase:<14} median={statistics.median(samples):8.2f}ms '
+              f'max={max(samples):8.2f}ms')
+    print(f'status {sorted({r["status"] for r in results})}')
@@ -0,0 +1,62 @@
+"""Count the requests and bytes the home page's static assets cost.
+
+    flask assets build
+    python -m benchmarks.static_assets
+
+Fetches every /static URL the home page refers to, as a browser that
+accepts br/gzip would, and prints requests and bytes on the wire, then
+the same for the page as it was before bundling (one request per source
+file, uncompressed). Fails if a built asset is missing its immutable cache
+header or if a precompressed copy does not decode to the original.
+"""
+import gzip
+import re
+import sys
+
+import brotli
+
+from app import create_app
+from assets import BUNDLES, FILES
+
+app = create_app({'CACHE_BACKEND': 'null', 'REQUEST_LOG': ''})
+
+DECODERS = {'br': brotli.decompress, 'gzip': gzip.decompress,
+            None: lambda data: data}
+
+
+def page_assets(client, path='/'):
+    html = client.get(path).get_data(as_text=True)
+    return [url for url in re.findall(r'(?:href|src)="(/static/[^"]+)"', html)
+            if not url.startswith('/static/ico/')]
+
+
+def fetch(client, urls, accept):
+    total, failures = 0, 0
+    for url in urls:
+        response = client.get(url, headers={'Accept-Encoding': accept})
+        total += len(response.data)
+        if '/dist/' in url and 'immutable' not in \
+                response.headers.get('Cache-Control', ''):
+            print(f'{url}: no immutable Cache-Control')
+            failures += 1
+        encoding = response.headers.get('Content-Encoding')
+        if encoding and DECODERS[encoding](response.data) != \
+                client.get(url, headers={'Accept-Encoding': ''}).data:
+            print(f'{url}: {encoding} copy differs from the original')
+            failures += 1
+    return total, failures
+
+
+if __name__ == '__main__':
+    client = app.test_client()
+    urls = page_assets(client)
+    if not any('/dist/' in url for url in urls):
+        print('no build found; run `flask assets build` first')
+        sys.exit(1)
+    built, failures = fetch(client, urls, 'br, gzip')
+    sources = [f'/static/{path}' for files in BUNDLES.values()
+               for path in files] + [f'/static/{path}' for path in FILES]
+    before, _ = fetch(client, sources, '')
+    print(f'built:   {len(urls):>3} requests {built:>10} bytes')
+    print(f'sources: {len(sources):>3} requests {before:>10} bytes')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,79 @@
+"""Time name-prefix lookups and updates on an in-memory PrefixIndex.
+
+    python -m benchmarks.typeahead --names 100000 --lookups 5000
+
+Builds the typeahead index from --names generated venue names (no database
+needed), then times lookups for random 1-4 letter prefixes of name words
+and adding/removing names one at a time, as commits do. Exits non-zero if
+a lookup disagrees with a linear scan of the names or if p99 lookup time
+is a millisecond or more.
+"""
+import argparse
+import random
+import sys
+import time
+
+from typeahead import PrefixIndex, name_keys, DEFAULT_LIMIT
+from benchmarks.util import timer, percentile
+
+WORDS = ['the', 'blue', 'note', 'musical', 'hop', 'park', 'square', 'live',
+         'music', 'coffee', 'house', 'dueling', 'pianos', 'bar', 'hall',
+         'garden', 'theatre', 'club', 'lounge', 'room', 'cellar', 'jazz']
+
+
+def names(count, rng):
+    return [(i, ' '.join(rng.choice(WORDS).title()
+                         for _ in range(rng.randint(1, 3))) + f' {i}')
+            for i in range(1, count + 1)]
+
+
+def scan(rows, prefix):
+    """Ids whose names have a word starting with `prefix`, the slow way."""
+    return {entity_id for entity_id, name in rows
+            if any(key.startswith(prefix) for key in name_keys(name))}
+
+
+def measure(label, samples):
+    print(f'{label:<20} n={len(samples):<6} '
+          f'p50={percentile(samples, 50) * 1000:8.1f}us '
+          f'p99={percentile(samples, 99) * 1000:8.1f}us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1613)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    rows = names(args.names, rng)
+    started = time.perf_counter()
+    index = PrefixIndex(rows)
+    print(f'built {len(index)} names, {len(index.keys)} keys in '
+          f'{(time.perf_counter() - started) * 1000:.0f}ms')
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 4)]
+                for _ in range(args.lookups)]
+    lookups = []
+    for prefix in prefixes:
+        with timer(lookups):
+            index.lookup(prefix)
+    measure('lookup', lookups)
+    updates = []
+    for entity_id, name in names(args.lookups, rng):
+        with timer(updates):
+            index.add(args.names + entity_id, name)
+        with timer(updates):
+            index.remove(args.names + entity_id)
+    measure('add/remove', updates)
+    failures = 0
+    for prefix in set(prefixes[:50]):
+        expected = scan(rows, prefix)
+        found = {entity_id for entity_id, _ in index.lookup(prefix)}
+        if not found <= expected or \
+                len(found) != min(len(expected), DEFAULT_LIMIT):
+            print(f'{prefix!r}: lookup disagrees with a scan')
+            failures += 1
+    if percentile(lookups, 99) >= 1:
+        print('p99 lookup is a millisecond or more')
+        failures += 1
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,375 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from datetime import timezone
+
+from flask import request, session, g, current_app, make_response, \
+    has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# ----------------------------------------------------------------------------#
+# Page and query result cache.
+#
+# Entries carry tags naming the entities they were built from, e.g.
+# 'venue:3', 'artist:7', 'area:CA:San Francisco' or a whole listing such as
+# 'shows'. Write handlers invalidate tags, which evicts exactly the entries
+# that rendered the changed entities.
+# ----------------------------------------------------------------------------#
+
+
+def venue_tag(venue_id):
+    return f'venue:{venue_id}'
+
+
+def artist_tag(artist_id):
+    return f'artist:{artist_id}'
+
+
+def area_tag(state, city):
+    return f'area:{state}:{city}'
+
+
+class NullCache:
+    """Backend that stores nothing; used when CACHE_BACKEND is 'null'."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None, tags=()):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+_null_cache = NullCache()
+
+
+class MemoryCache:
+    """In-process cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_entries=1024, default_ttl=60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at <= self.clock():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, tags=()):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (self.clock() + ttl, value, frozenset(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """Cache backed by any Redis-compatible client.
+
+    Only get/set(ex=)/delete/sadd/smembers/expire/ttl/scan_iter are used,
+    so a local fake client can stand in for Redis. LRU eviction is left to
+    the server's maxmemory-policy (allkeys-lru).
+    """
+
+    def __init__(self, client, default_ttl=60, prefix='fyyur:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' requires the redis package")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}tag:{tag}'
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None, tags=()):
+        ttl = self.default_ttl if ttl is None else ttl
+        self.client.set(self._key(key), pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            self.client.sadd(tag_key, self._key(key))
+            # A tag must outlive every key in it, so a short-lived entry
+            # never cuts the expiry of one that was stored for longer.
+            if self.client.ttl(tag_key) < ttl:
+                self.client.expire(tag_key, ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self._key(key) for key in keys])
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            keys = self.client.smembers(self._tag_key(tag))
+            self.client.delete(self._tag_key(tag), *keys)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class PageCache:
+    """Flask extension caching rendered pages and query results.
+
+    The backend is kept per application in app.extensions['page_cache'],
+    so one PageCache instance can serve several apps built by create_app().
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        if kind == 'memory':
+            backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+        elif kind == 'redis':
+            backend = RedisCache.from_url(app.config['CACHE_REDIS_URL'],
+                                          default_ttl=ttl)
+        else:
+            backend = NullCache()
+        app.extensions['page_cache'] = backend
+
+    @property
+    def backend(self):
+        if has_app_context():
+            return current_app.extensions.get('page_cache', _null_cache)
+        return _null_cache
+
+    def get_or_set(self, key, producer, ttl=None, tags=()):
+        """Cached query result for `key`, computing it with producer()."""
+        value = self.backend.get(key)
+        if value is None:
+            value = producer()
+            self.backend.set(key, value, ttl, tags)
+        return value
+
+    def invalidate(self, *tags):
+        self.backend.invalidate(*tags)
+
+    def cached(self, ttl=None, tags=(), version=None):
+        """Cache a GET view's rendered HTML, keyed on path and query string.
+
+        The view adds entity tags with tag_page(). Pages are neither served
+        from nor stored into the cache while flash messages are pending.
+        `version()`, when given, is read before the view runs and becomes
+        part of the key, so a page rendered from an older version of its
+        source can never be served once the version has moved on, even if
+        it is stored after the matching invalidate().
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+                key = 'page:' + request.full_path
+                if version is not None:
+                    key = f'page:{version()}:{request.full_path}'
+                html = self.backend.get(key)
+                if html is not None:
+                    return html
+                g.cache_tags = set(tags)
+                rv = view(*args, **kwargs)
+                if isinstance(rv, str) and not session.get('_flashes'):
+                    self.backend.set(key, rv, ttl, g.cache_tags)
+                return rv
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
+
+
+def tag_page(*tags):
+    """Record entity tags for the page being rendered by a cached view."""
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and since >= last_modified)
+
+
+def conditional(validator):
+    """Answer GETs with 304 when the client's copy is still current.
+
+    `validator` receives the view arguments and returns (last_modified,
+    token) or None, as the queries.*_validator functions do. A matching
+    If-None-Match (or If-Modified-Since) returns 304 before the view runs,
+    so neither the show queries nor the template render happen.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            state = validator(*args, **kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+            last_modified, token = state
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0,
+                                                      tzinfo=timezone.utc)
+            salt = current_app.config.get('ETAG_SALT', '')
+            etag = hashlib.sha1(
+                f'{salt}|{request.full_path}|{last_modified}|{token}'.encode()
+            ).hexdigest()
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Template fragment cache.
+#
+#     {% cache show, 300 %} ... {% endcache %}
+#
+# caches the rendered block under its template name and key for 300
+# seconds (FRAGMENT_CACHE_TTL if omitted). The key is the row the block
+# renders, so its entity ids are the identity and its other values, e.g. a
+# show's start time or its artist's current name, are the version stamp:
+# an edited row gets a new key and stale fragments simply age out of the
+# bounded LRU. Dicts and lists in keys are compared by value. The block
+# must not depend on anything outside its key.
+# ----------------------------------------------------------------------------#
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension adding the {% cache key[, ttl] %} block."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', args), [], [],
+                               body).set_lineno(lineno)
+
+    def _cached(self, template, key, ttl, caller):
+        cache = current_app.extensions.get('fragment_cache') \
+            if has_app_context() else None
+        if cache is None:
+            return caller()
+        key = (template, _freeze(key))
+        html = cache.get(key)
+        if html is None:
+            html = Markup(caller())
+            cache.set(key, html, ttl)
+        return html
+
+
+class FragmentCache:
+    """Flask extension holding the per-process fragment LRU.
+
+    FRAGMENT_CACHE_MAX_ENTRIES = 0 turns {% cache %} blocks into plain
+    blocks.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+        app.extensions['fragment_cache'] = MemoryCache(
+            max_entries, app.config.get('FRAGMENT_CACHE_TTL', 300)) \
+            if max_entries else None
@@ -0,0 +1,69 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# ----------------------------------------------------------------------------#
+# Per-process state kept in step with committed writes.
+#
+# The known-id arrays (references.py), the name picker (typeahead.py), the
+# in-memory search index (search.py) and the area summary's stale flag
+# (summary.py) are all derived from the venues, artists and shows tables.
+# Each registers a CommitQueue: mapper events and ORM bulk statements queue
+# changes on the session, the changes are applied once the transaction
+# commits and dropped if it rolls back, so neither a rolled-back write nor
+# a reload racing an uncommitted one ever reaches that state.
+# ----------------------------------------------------------------------------#
+
+BULK_WRITES = ('insert', 'update', 'delete')
+
+
+class CommitQueue:
+    """Changes queued in session.info[name] and applied after commit.
+
+    apply(change) runs for each change queued by a listen()ed mapper event,
+    and reload(model) once for each of `models` that an ORM-enabled bulk
+    statement of a kind in `bulk` wrote to, since those rows are not known
+    one by one.
+    """
+
+    def __init__(self, name, models, apply, reload, bulk=BULK_WRITES):
+        self.name = name
+        self.models = tuple(models)
+        self.apply = apply
+        self.reload = reload
+        self.bulk = bulk
+        event.listen(Session, 'do_orm_execute', self._on_bulk_write)
+        event.listen(Session, 'after_commit', self._on_commit)
+        event.listen(Session, 'after_rollback', self._on_rollback)
+
+    def listen(self, event_name, change):
+        """Queue change(target) on the mapper event of every model.
+
+        `change` may return None to queue nothing.
+        """
+        def listener(mapper, connection, target):
+            value = change(target)
+            if value is not None:
+                self._queue(object_session(target), 'change', value)
+        for model in self.models:
+            event.listen(model, event_name, listener)
+
+    def _queue(self, session, kind, value):
+        if session is not None:
+            session.info.setdefault(self.name, []).append((kind, value))
+
+    def _on_bulk_write(self, orm_execute_state):
+        if any(getattr(orm_execute_state, f'is_{kind}') for kind in self.bulk):
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None and mapper.class_ in self.models:
+                self._queue(orm_execute_state.session, 'reload', mapper.class_)
+
+    def _on_commit(self, session):
+        queued = session.info.pop(self.name, ())
+        for kind, value in queued:
+            if kind == 'change':
+                self.apply(value)
+        for model in {value for kind, value in queued if kind == 'reload'}:
+            self.reload(model)
+
+    def _on_rollback(self, session):
+        session.info.pop(self.name, None)
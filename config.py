@@ -15,4 +15,92 @@ host = '@localhost'
 port = ':5432'
 db_name = '/fyyur'
 
-SQLALCHEMY_DATABASE_URI = f'{dialect}{username}{password}{host}{port}{db_name}'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', f'{dialect}{username}{password}{host}{port}{db_name}')
+
+# Connection pool, per worker process. Keep
+# workers * (FYYUR_DB_POOL_SIZE + FYYUR_DB_MAX_OVERFLOW) below the
+# server's max_connections.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('FYYUR_DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('FYYUR_DB_MAX_OVERFLOW', 10)),
+    'pool_recycle': int(os.environ.get('FYYUR_DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('FYYUR_DB_POOL_PRE_PING', '1') == '1',
+    'pool_timeout': float(os.environ.get('FYYUR_DB_POOL_TIMEOUT', 30)),
+}
+
+# Set when connecting through PgBouncer in transaction pooling mode: no
+# server-side state is kept across transactions. The sync pool skips its
+# pre-ping (and psycopg 3 its prepared statements), the async engine turns
+# off asyncpg's statement caches, and exports read in keyset batches
+# instead of through a named cursor.
+PGBOUNCER_MODE = os.environ.get('FYYUR_PGBOUNCER', '') == '1'
+
+# Send /shows to the client as the template renders instead of building
+# the whole page first. Only the template output is streamed: the page's
+# rows (at most MAX_PAGE_SIZE) are fetched before rendering starts.
+STREAM_SHOWS = os.environ.get('FYYUR_STREAM_SHOWS', '') == '1'
+
+# Keyset pagination for /shows, /artists and /venues.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Venue/artist search: 'postgres' uses the pg_trgm indexes, 'memory' an
+# in-process inverted index (no Postgres required).
+SEARCH_BACKEND = os.environ.get('FYYUR_SEARCH_BACKEND', 'postgres')
+SEARCH_RESULT_LIMIT = 50
+
+# Rendered page / query result cache: 'memory', 'redis' or 'null'. The
+# memory backend is per process; use redis when running several workers.
+CACHE_BACKEND = os.environ.get('FYYUR_CACHE_BACKEND', 'memory')
+CACHE_DEFAULT_TTL = 60
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = os.environ.get('FYYUR_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# {% cache %} template fragments, kept in a per-process LRU; 0 entries
+# disables it.
+FRAGMENT_CACHE_MAX_ENTRIES = int(
+    os.environ.get('FYYUR_FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+FRAGMENT_CACHE_TTL = 300
+
+# Mixed into every ETag; change it when a deploy alters page markup.
+ETAG_SALT = os.environ.get('FYYUR_ETAG_SALT', '')
+
+# /venues reads the venue_area_summary materialized view, refreshed after
+# venue/show writes and whenever it is older than AREA_SUMMARY_MAX_AGE
+# seconds. Set FYYUR_AREA_SUMMARY=0 to group venues on every request instead.
+AREA_SUMMARY = os.environ.get('FYYUR_AREA_SUMMARY', '1') == '1'
+AREA_SUMMARY_MAX_AGE = int(os.environ.get('FYYUR_AREA_SUMMARY_MAX_AGE', 60))
+
+# The new-show form's venue/artist name picker reads a per-process prefix
+# index, reloaded when older than TYPEAHEAD_MAX_AGE seconds so that names
+# created by other workers show up.
+TYPEAHEAD_MAX_AGE = int(os.environ.get('FYYUR_TYPEAHEAD_MAX_AGE', 300))
+
+# Per-request timing and SQL counts go to /metrics, and also to this JSONL
+# file when one is set (off by default). Statements slower than
+# SLOW_QUERY_SECONDS are logged with their parameters to that file, or as
+# warnings to the app log when it is not set.
+REQUEST_LOG = os.environ.get('FYYUR_REQUEST_LOG', '')
+SLOW_QUERY_SECONDS = float(os.environ.get('FYYUR_SLOW_QUERY_SECONDS', 0.25))
+
+# Longest ?start=&end= range /shows and /api/v1/shows accept.
+SHOW_CALENDAR_MAX_DAYS = 366
+
+# Background jobs (jobs.py): worker threads per process, how often a
+# running job stamps its heartbeat, and how long a job may sit queued, or
+# run without a heartbeat, before `flask jobs recover` retries it.
+JOB_WORKERS = int(os.environ.get('FYYUR_JOB_WORKERS', 2))
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('FYYUR_JOB_HEARTBEAT_SECONDS', 15))
+JOB_STALE_SECONDS = int(os.environ.get('FYYUR_JOB_STALE_SECONDS', 120))
+
+# Async read path under /async (aio.py). Defaults to DATABASE_URL on the
+# asyncpg driver; its pool is separate from SQLALCHEMY_ENGINE_OPTIONS' and
+# shared by every request in the worker.
+ASYNC_DATABASE_URI = os.environ.get('FYYUR_ASYNC_DATABASE_URL')
+ASYNC_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('FYYUR_ASYNC_DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('FYYUR_ASYNC_DB_MAX_OVERFLOW', 10)),
+    'pool_recycle': int(os.environ.get('FYYUR_DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('FYYUR_DB_POOL_PRE_PING', '1') == '1',
+}
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from models import db, Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+# Streaming catalog export.
+#
+#   flask export venues --format jsonl --gzip -o venues.jsonl.gz
+#   flask export shows --since 2026-10-01T00:00:00
+#   GET /api/v1/export/shows?format=csv&gzip=1&since=2026-10-01
+#
+# Rows come off a server-side cursor (yield_per) and are encoded one batch
+# at a time, so memory stays flat whatever the table size. Under
+# PGBOUNCER_MODE, where named cursors are unavailable, rows are read in
+# keyset batches on id instead. --since keeps rows whose updated_at is at
+# or after the given time, for incremental dumps.
+# ----------------------------------------------------------------------------#
+
+EXPORT_BATCH = 1000
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+
+def parse_since(value):
+    """datetime from an ISO 8601 --since/?since= value, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'invalid since value {value!r}; use ISO 8601')
+
+
+def export_columns(kind):
+    return [column.key for column in EXPORT_MODELS[kind].__table__.columns]
+
+
+def export_rows(kind, since=None):
+    """Yield rows of `kind` as tuples in export_columns() order, by id."""
+    model = EXPORT_MODELS[kind]
+    stmt = select(*model.__table__.columns)
+    if since is not None:
+        stmt = stmt.where(model.updated_at >= since)
+    if not current_app.config.get('PGBOUNCER_MODE'):
+        stmt = stmt.order_by(model.id).execution_options(yield_per=EXPORT_BATCH)
+        yield from db.session.execute(stmt)
+        return
+    last_id = None
+    while True:
+        batch_stmt = stmt if last_id is None else stmt.where(model.id > last_id)
+        rows = db.session.execute(
+            batch_stmt.order_by(model.id).limit(EXPORT_BATCH)).all()
+        yield from rows
+        if len(rows) < EXPORT_BATCH:
+            return
+        last_id = rows[-1].id
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        # Same separator `flask import` splits genres on.
+        return ','.join(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_jsonl(columns, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(
+            {c: _json_value(v) for c, v in zip(columns, row)}))
+        if len(lines) >= EXPORT_BATCH:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, fmt='jsonl', since=None, compress=False):
+    """Encoded byte chunks of a whole export, produced incrementally."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'unknown export format {fmt!r}')
+    columns = export_columns(kind)
+    encode = encode_csv if fmt == 'csv' else encode_jsonl
+    chunks = encode(columns, export_rows(kind, since))
+    return gzipped(chunks) if compress else chunks
+
+
+def export_filename(kind, fmt, compress):
+    return f'{kind}.{fmt}' + ('.gz' if compress else '')
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORT_MODELS)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS),
+              default='jsonl', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--since', help='Only rows updated at or after this ISO time.')
+@click.option('-o', '--output', type=click.File('wb'), default='-',
+              help='Output file (default: stdout).')
+@with_appcontext
+def export_command(kind, fmt, compress, since, output):
+    """Stream venues, artists or shows out as CSV or JSONL."""
+    try:
+        since = parse_since(since)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint='--since')
+    for chunk in export_stream(kind, fmt, since, compress):
+        output.write(chunk)
@@ -1,7 +1,21 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, \
+    TextAreaField
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, \
+    ValidationError
+
+from models import Venue, Artist
+from references import id_exists, venue_booked
+
+
+def _reference(model, field):
+    # Checked against the in-process id array, not by a failed insert.
+    raw = (field.data or '').strip()
+    if not raw.isdigit():
+        raise ValidationError('must be a number')
+    if not id_exists(model, int(raw)):
+        raise ValidationError(f'matches no {model.__tablename__[:-1]}')
 
 
 class ShowForm(Form):
@@ -17,6 +31,34 @@ class ShowForm(Form):
         default=datetime.today()
     )
 
+    def validate_artist_id(self, field):
+        _reference(Artist, field)
+
+    def validate_venue_id(self, field):
+        _reference(Venue, field)
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        if venue_booked(int(self.venue_id.data), self.start_time.data):
+            self.start_time.errors.append(
+                'the venue already has a show at this time')
+            return False
+        return True
+
+
+class ShowBatchForm(Form):
+    # CSV with a header row; each row is checked like a ShowForm, and
+    # venue_name/artist_name may stand in for the ids as in `flask import`.
+    rows = TextAreaField(
+        'rows',
+        validators=[DataRequired()],
+        default='artist_id,venue_id,start_time\n'
+    )
+    atomic = BooleanField(
+        'atomic'
+    )
+
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,423 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select, tuple_
+from models import db, Venue, Artist, Show
+from cache import page_cache, venue_tag, artist_tag
+
+# ----------------------------------------------------------------------------#
+# Bulk import of partner catalogs.
+#
+#   flask import venues venues.csv
+#   flask import artists artists.jsonl --chunk-size 5000
+#   flask import shows shows.csv --rejects rejected.jsonl
+#
+# Rows are streamed in chunks, checked against the validators declared on
+# VenueForm/ArtistForm/ShowForm (applied directly, without building a form
+# per row) and loaded with one multi-row INSERT and one commit per chunk.
+# Shows may name their venue and artist instead of giving ids: venue_name
+# (plus venue_city/venue_state when the name is ambiguous) and artist_name.
+# ----------------------------------------------------------------------------#
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Form field name -> model column, where they differ.
+COLUMN_NAMES = {'website_link': 'website'}
+
+
+class _Field:
+    """The slice of a WTForms field that the stock validators look at."""
+
+    __slots__ = ('data', 'errors')
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def _field_kind(field_class):
+    from wtforms import BooleanField, DateTimeField, SelectField, \
+        SelectMultipleField
+    for kind, base in (('multiple', SelectMultipleField),
+                       ('select', SelectField),
+                       ('boolean', BooleanField),
+                       ('datetime', DateTimeField)):
+        if issubclass(field_class, base):
+            return kind
+    return 'text'
+
+
+class RowValidator:
+    """Validation rules of a WTForms form class, applied to plain dicts."""
+
+    def __init__(self, form_class):
+        from wtforms.fields.core import UnboundField
+        from wtforms.validators import StopValidation, ValidationError
+        self._errors = (StopValidation, ValidationError)
+        fields = sorted(
+            ((name, value) for name, value in vars(form_class).items()
+             if isinstance(value, UnboundField)),
+            key=lambda item: item[1].creation_counter)
+        self.fields = []
+        for name, unbound in fields:
+            fmt = unbound.kwargs.get('format', '%Y-%m-%d %H:%M:%S')
+            self.fields.append((
+                name, _field_kind(unbound.field_class),
+                unbound.kwargs.get('validators') or [],
+                [choice[0] for choice in unbound.kwargs.get('choices') or []],
+                fmt if isinstance(fmt, list) else [fmt]))
+
+    def __call__(self, raw):
+        """Return (data, errors) for one input row."""
+        data, errors = {}, {}
+        for name, kind, validators, choices, formats in self.fields:
+            try:
+                value = self._coerce(kind, raw.get(name), formats)
+            except ValueError as err:
+                errors[name] = [str(err)]
+                continue
+            messages = self._validate(value, validators, kind, choices)
+            if messages:
+                errors[name] = messages
+            else:
+                data[COLUMN_NAMES.get(name, name)] = value
+        return data, errors
+
+    @staticmethod
+    def _coerce(kind, value, formats):
+        if kind == 'multiple':
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(',') if v.strip()]
+            return list(value or [])
+        if kind == 'boolean':
+            # BooleanField.false_values
+            if isinstance(value, str):
+                value = value.strip().lower()
+            return value not in (False, 'false', '', None)
+        if kind == 'datetime':
+            if value in (None, '') or isinstance(value, datetime):
+                return value or None
+            for fmt in formats:
+                try:
+                    return datetime.strptime(value, fmt)
+                except ValueError:
+                    pass
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError('Not a valid datetime value.')
+        return '' if value is None else str(value)
+
+    def _validate(self, value, validators, kind, choices):
+        StopValidation, ValidationError = self._errors
+        field = _Field(value)
+        for validator in validators:
+            try:
+                validator(None, field)
+            except StopValidation as err:
+                if err.args and err.args[0]:
+                    field.errors.append(err.args[0])
+                return field.errors
+            except ValidationError as err:
+                field.errors.append(err.args[0])
+        if choices and not field.errors:
+            values = value if kind == 'multiple' else [value]
+            if kind == 'select' and value == '':
+                values = []
+            if any(v not in choices for v in values):
+                field.errors.append('Not a valid choice.')
+        return field.errors
+
+
+# ----------------------------------------------------------------------------#
+# Input.
+# ----------------------------------------------------------------------------#
+
+def read_rows(stream, fmt):
+    """(line number, dict) pairs from a CSV (with header) or JSONL stream."""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as err:
+                    yield number, err
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ----------------------------------------------------------------------------#
+# Natural key resolution for shows.
+# ----------------------------------------------------------------------------#
+
+class ReferenceResolver:
+    """Map venue/artist names in show rows to ids, one query per chunk."""
+
+    def __init__(self):
+        self.venues = {}
+        self.artists = {}
+
+    def prime(self, rows):
+        venue_names = {r.get('venue_name') for r in rows
+                       if not r.get('venue_id') and r.get('venue_name')}
+        artist_names = {r.get('artist_name') for r in rows
+                        if not r.get('artist_id') and r.get('artist_name')}
+        venue_names -= set(self.venues)
+        artist_names -= set(self.artists)
+        if venue_names:
+            for name in venue_names:
+                self.venues[name] = []
+            for row in db.session.execute(
+                    select(Venue.id, Venue.name, Venue.city, Venue.state)
+                    .where(Venue.name.in_(venue_names))):
+                self.venues[row.name].append((row.id, row.city, row.state))
+        if artist_names:
+            for name in artist_names:
+                self.artists[name] = []
+            for row in db.session.execute(
+                    select(Artist.id, Artist.name)
+                    .where(Artist.name.in_(artist_names))):
+                self.artists[row.name].append(row.id)
+
+    def venue_id(self, row):
+        if row.get('venue_id'):
+            return row['venue_id'], None
+        name = row.get('venue_name')
+        if not name:
+            return None, 'venue_id or venue_name is required'
+        matches = [m for m in self.venues.get(name, [])
+                   if row.get('venue_city') in (None, '', m[1])
+                   and row.get('venue_state') in (None, '', m[2])]
+        if len(matches) != 1:
+            return None, f"{'ambiguous' if matches else 'unknown'} venue {name!r}"
+        return matches[0][0], None
+
+    def artist_id(self, row):
+        if row.get('artist_id'):
+            return row['artist_id'], None
+        name = row.get('artist_name')
+        if not name:
+            return None, 'artist_id or artist_name is required'
+        matches = self.artists.get(name, [])
+        if len(matches) != 1:
+            return None, f"{'ambiguous' if matches else 'unknown'} artist {name!r}"
+        return matches[0], None
+
+
+def _existing_ids(model, ids):
+    ids = {int(i) for i in ids if str(i).isdigit()}
+    if not ids:
+        return set()
+    return set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+
+
+# ----------------------------------------------------------------------------#
+# Loading.
+# ----------------------------------------------------------------------------#
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.loaded = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+
+    def reject(self, line, errors, row):
+        self.rejected.append((line, errors, row))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        rate = self.loaded / self.elapsed if self.elapsed else 0.0
+        return (f'{self.read} rows read, {self.loaded} loaded, '
+                f'{len(self.rejected)} rejected in {self.elapsed:.2f}s '
+                f'({rate:,.0f} rows/s)')
+
+
+def _reference_errors(raw, data, resolver, venue_ids, artist_ids):
+    errors = {}
+    for key, resolve, known in (('venue_id', resolver.venue_id, venue_ids),
+                                ('artist_id', resolver.artist_id, artist_ids)):
+        ref, error = resolve(raw)
+        if error is None and not (str(ref).isdigit() and int(ref) in known):
+            error = f'no {key[:-3]} with id {ref}'
+        if error:
+            errors[key] = [error]
+        else:
+            data[key] = int(ref)
+    return errors
+
+
+def _validated(kind, chunk, report, resolver):
+    validate = row_validator(kind)
+    rows = [row for _, row in chunk if isinstance(row, dict)]
+    if kind == 'shows':
+        resolver.prime(rows)
+        venue_ids = _existing_ids(Venue, [resolver.venue_id(r)[0] for r in rows])
+        artist_ids = _existing_ids(Artist, [resolver.artist_id(r)[0] for r in rows])
+    for line, raw in chunk:
+        if not isinstance(raw, dict):
+            report.reject(line, {'row': [str(raw) or 'not an object']}, None)
+            continue
+        data, errors = validate(raw)
+        if kind == 'shows':
+            errors.update(_reference_errors(raw, data, resolver,
+                                            venue_ids, artist_ids))
+        if errors:
+            report.reject(line, errors, raw)
+        else:
+            yield line, raw, data
+
+
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+_validators = {}
+
+
+def row_validator(kind):
+    if kind not in _validators:
+        from forms import VenueForm, ArtistForm, ShowForm
+        forms = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}
+        _validators[kind] = RowValidator(forms[kind])
+    return _validators[kind]
+
+
+def import_rows(kind, rows, chunk_size=IMPORT_CHUNK_SIZE, on_chunk=None):
+    """Validate and load (line, row) pairs; returns an ImportReport.
+
+    `on_chunk(report, rows)` is called after each chunk is committed.
+    """
+    model = MODELS[kind]
+    report = ImportReport()
+    resolver = ReferenceResolver()
+    for chunk in chunked(rows, chunk_size):
+        report.read += len(chunk)
+        data = [row for _, _, row in _validated(kind, chunk, report, resolver)]
+        if data:
+            db.session.execute(insert(model), data)
+            db.session.commit()
+            report.loaded += len(data)
+        if on_chunk is not None:
+            on_chunk(report, data)
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Show batches from the web.
+#
+# A batch is validated like an import chunk (one reference query per entity
+# type), checked for double-booked venues with one more query, and inserted
+# with one multi-row INSERT in a single transaction. Rows that fail are
+# reported and the rest are listed, unless the batch is atomic, in which
+# case nothing is.
+# ----------------------------------------------------------------------------#
+
+SHOW_BATCH_MAX_ROWS = 5000
+
+
+def _booked(validated):
+    """The validated rows whose venue already has a show at that time, in
+    the database or earlier in the batch."""
+    pairs = {(data['venue_id'], data['start_time'])
+             for _, _, data in validated}
+    taken = set()
+    if pairs:
+        taken = {tuple(row) for row in db.session.execute(
+            select(Show.venue_id, Show.start_time)
+            .where(tuple_(Show.venue_id, Show.start_time).in_(pairs)))}
+    for item in validated:
+        key = (item[2]['venue_id'], item[2]['start_time'])
+        if key in taken:
+            yield item
+        taken.add(key)
+
+
+def create_show_batch(rows, atomic=False):
+    """Validate and insert (line, row) show pairs in one transaction.
+
+    Returns the ImportReport and the ids of the new shows.
+    """
+    rows = list(rows)
+    if len(rows) > SHOW_BATCH_MAX_ROWS:
+        raise ValueError(f'at most {SHOW_BATCH_MAX_ROWS} shows per batch')
+    report = ImportReport()
+    report.read = len(rows)
+    validated = list(_validated('shows', rows, report, ReferenceResolver()))
+    booked = set()
+    for line, raw, _ in _booked(validated):
+        report.reject(line, {'start_time': [
+            'the venue already has a show at this time']}, raw)
+        booked.add(line)
+    data = [data for line, _, data in validated if line not in booked]
+    report.rejected.sort(key=lambda rejected: rejected[0])
+    if not data or (atomic and report.rejected):
+        db.session.rollback()
+        return report, []
+    ids = list(db.session.scalars(insert(Show).returning(Show.id), data))
+    db.session.commit()
+    report.loaded = len(ids)
+    page_cache.invalidate('shows',
+                          *{venue_tag(row['venue_id']) for row in data},
+                          *{artist_tag(row['artist_id']) for row in data})
+    return report, ids
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(MODELS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True,
+              help='Rows validated and inserted per transaction.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows and their errors here as JSONL.')
+@with_appcontext
+def import_command(kind, source, fmt, chunk_size, rejects):
+    """Bulk load venues, artists or shows from a CSV or JSONL file."""
+    from summary import summary_enabled, refresh_area_summary
+    fmt = fmt or ('jsonl' if source.name.endswith(('.jsonl', '.json'))
+                  else 'csv')
+
+    def progress(report, data):
+        tags = {kind}
+        if kind == 'shows':
+            tags.update(venue_tag(row['venue_id']) for row in data)
+            tags.update(artist_tag(row['artist_id']) for row in data)
+        page_cache.invalidate(*tags)
+        click.echo(report.summary(), err=True)
+
+    report = import_rows(kind, read_rows(source, fmt), chunk_size, progress)
+    if kind != 'artists' and report.loaded and summary_enabled():
+        refresh_area_summary()
+    if rejects is not None:
+        for line, errors, row in report.rejected:
+            rejects.write(json.dumps({'line': line, 'errors': errors,
+                                      'row': row}, default=str) + '\n')
+    for line, errors, _ in report.rejected[:20]:
+        click.echo(f'line {line}: {errors}', err=True)
+    if len(report.rejected) > 20 and rejects is None:
+        click.echo(f'... {len(report.rejected) - 20} more; use --rejects', err=True)
+    click.echo(report.summary())
@@ -0,0 +1,254 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, delete, func, or_, and_
+
+from models import db, Venue, Show, Job
+from cache import page_cache, venue_tag, artist_tag, area_tag
+
+# ----------------------------------------------------------------------------#
+# Background jobs.
+#
+# Heavy writes are recorded as rows in the jobs table and run on a small
+# per-process thread pool (JOB_WORKERS threads), so the request that asked
+# for them can answer 202 with the job id straight away. A worker claims a
+# job by moving it from 'queued' to 'running' in one UPDATE, so each job
+# runs once even with several processes, and while it runs a heartbeat
+# thread stamps heartbeat_at every JOB_HEARTBEAT_SECONDS. Jobs a process
+# that died left queued for JOB_STALE_SECONDS, or running without a
+# heartbeat for that long, are picked up again by `flask jobs recover` and
+# by the first enqueue in each process; a slow job that is still beating
+# is never run twice. Handlers must therefore be safe to rerun from any
+# point.
+# ----------------------------------------------------------------------------#
+
+JOB_DELETE_BATCH = 5000
+
+_handlers = {}
+
+
+def job(kind):
+    """Register a function(**payload) -> result as the handler for `kind`."""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class JobRunner:
+    """Flask extension owning the per-app executor.
+
+    The executor is created on the first enqueue, so create_app() starts
+    no threads.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['jobs'] = {'executor': None, 'recovered': False,
+                                  'lock': threading.Lock()}
+
+    def _executor(self, app):
+        state = app.extensions['jobs']
+        with state['lock']:
+            if state['executor'] is None:
+                state['executor'] = ThreadPoolExecutor(
+                    max_workers=app.config.get('JOB_WORKERS', 2),
+                    thread_name_prefix='fyyur-job')
+            recover = not state['recovered']
+            state['recovered'] = True
+        return state['executor'], recover
+
+    def enqueue(self, kind, **payload):
+        """Record a job, start it in the background and return its id."""
+        if kind not in _handlers:
+            raise KeyError(f'no job handler for {kind!r}')
+        entry = Job(kind=kind, payload=payload)
+        db.session.add(entry)
+        db.session.commit()
+        app = current_app._get_current_object()
+        executor, recover = self._executor(app)
+        executor.submit(_run, app, entry.id)
+        if recover:
+            for job_id in stale_job_ids():
+                executor.submit(_run, app, job_id)
+        return entry.id
+
+
+runner = JobRunner()
+
+
+def _stale_cutoff():
+    return datetime.utcnow() - timedelta(
+        seconds=current_app.config.get('JOB_STALE_SECONDS', 120))
+
+
+def _abandoned(cutoff):
+    """Queued too long, or running with no heartbeat since `cutoff`."""
+    return or_(and_(Job.status == 'queued', Job.created_at < cutoff),
+               and_(Job.status == 'running',
+                    func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff))
+
+
+def stale_job_ids():
+    """Jobs a dead process left queued or running."""
+    return db.session.scalars(
+        select(Job.id).where(_abandoned(_stale_cutoff()))
+        .order_by(Job.id)).all()
+
+
+def _claim(job_id):
+    # A still-queued job, or a running one whose worker stopped beating.
+    # Two claims of the same row serialize on its lock, and the loser sees
+    # the winner's fresh heartbeat.
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .where(or_(Job.status == 'queued', _abandoned(_stale_cutoff())))
+        .values(status='running', started_at=now, heartbeat_at=now,
+                attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    return claimed.rowcount == 1
+
+
+def _beat(app, job_id, stop):
+    interval = app.config.get('JOB_HEARTBEAT_SECONDS', 15)
+    while not stop.wait(interval):
+        try:
+            with app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    update(Job).where(Job.id == job_id)
+                    .where(Job.status == 'running')
+                    .values(heartbeat_at=datetime.utcnow()))
+        except Exception:
+            app.logger.exception('heartbeat for job %s failed', job_id)
+
+
+def run_job(job_id):
+    """Claim and run one job in the current app context."""
+    if not _claim(job_id):
+        return
+    entry = db.session.get(Job, job_id)
+    stop = threading.Event()
+    threading.Thread(target=_beat, name='fyyur-job-heartbeat', daemon=True,
+                     args=(current_app._get_current_object(), job_id,
+                           stop)).start()
+    try:
+        result = _handlers[entry.kind](**entry.payload)
+        values = dict(status='done', result=result)
+    except Exception as err:
+        db.session.rollback()
+        current_app.logger.error(traceback.format_exc())
+        values = dict(status='failed', error=f'{type(err).__name__}: {err}')
+    finally:
+        stop.set()
+    db.session.execute(
+        update(Job).where(Job.id == job_id)
+        .values(finished_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def _run(app, job_id):
+    with app.app_context():
+        try:
+            run_job(job_id)
+        finally:
+            db.session.remove()
+
+
+# ----------------------------------------------------------------------------#
+# Handlers.
+# ----------------------------------------------------------------------------#
+
+@job('delete_venue')
+def delete_venue(venue_id):
+    """Delete a venue's shows in batches, then the venue itself.
+
+    Each batch is its own short transaction, so neither the shows table
+    nor the worker is held for the whole cascade. The cached pages are
+    dropped before the first batch and after each one, so a cascade that
+    dies half way is never hidden behind pages cached from before it; the
+    rerun picks up the remaining shows.
+    """
+    venue = db.session.execute(
+        select(Venue.state, Venue.city).where(Venue.id == venue_id)).first()
+    if venue is None:
+        return {'deleted_shows': 0, 'deleted': False}
+    artist_ids = db.session.scalars(
+        select(Show.artist_id).where(Show.venue_id == venue_id).distinct()).all()
+    tags = [venue_tag(venue_id), area_tag(*venue), 'venues', 'shows',
+            *[artist_tag(a) for a in artist_ids]]
+    page_cache.invalidate(*tags)
+    deleted_shows = 0
+    while True:
+        batch = select(Show.id).where(Show.venue_id == venue_id) \
+            .limit(JOB_DELETE_BATCH).scalar_subquery()
+        count = db.session.execute(
+            delete(Show).where(Show.id.in_(batch))
+            .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        page_cache.invalidate(*tags)
+        deleted_shows += count
+        if count < JOB_DELETE_BATCH:
+            break
+    db.session.execute(delete(Venue).where(Venue.id == venue_id)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    page_cache.invalidate(*tags)
+    return {'deleted_shows': deleted_shows, 'deleted': True}
+
+
+# ----------------------------------------------------------------------------#
+# CLI.
+# ----------------------------------------------------------------------------#
+
+@click.group('jobs')
+def jobs_command():
+    """Inspect and recover background jobs."""
+
+
+@jobs_command.command('recover')
+@with_appcontext
+def recover_command():
+    """Run jobs that a dead process left queued or running, in this process."""
+    job_ids = stale_job_ids()
+    for job_id in job_ids:
+        run_job(job_id)
+    click.echo(f'Ran {len(job_ids)} stale job(s).')
+
+
+@jobs_command.command('prune')
+@click.option('--days', default=7, show_default=True)
+@with_appcontext
+def prune_command(days):
+    """Delete finished jobs older than --days."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = db.session.execute(
+        delete(Job).where(Job.status.in_(['done', 'failed']))
+        .where(Job.finished_at < cutoff)).rowcount
+    db.session.commit()
+    click.echo(f'Deleted {count} job(s).')
+
+
+@jobs_command.command('list')
+@click.option('--status', help='Only jobs in this status.')
+@click.option('--limit', default=20, show_default=True)
+@with_appcontext
+def list_command(status, limit):
+    """Show the most recent jobs."""
+    stmt = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status:
+        stmt = stmt.where(Job.status == status)
+    for entry in db.session.scalars(stmt):
+        click.echo(f'{entry.id:>6} {entry.kind:<22} {entry.status:<8} '
+                   f'{entry.created_at:%Y-%m-%d %H:%M:%S} {entry.error or ""}')
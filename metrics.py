@@ -0,0 +1,275 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+from flask import g, request, current_app, has_request_context, \
+    has_app_context
+from flask.signals import signals_available, before_render_template, \
+    template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------------------------------------------------------------------#
+# Request instrumentation.
+#
+# Every request records its route, status, total latency, template render
+# time and the number and total time of its SQL statements. Each request is
+# added to in-process totals that /metrics serves in the Prometheus text
+# format and, when REQUEST_LOG is set, written as one line to that JSONL
+# file. A statement slower than SLOW_QUERY_SECONDS is logged with its
+# parameters to the same file, or as a warning on app.logger when there is
+# no REQUEST_LOG. Template timing needs blinker (Flask signals). Streamed
+# responses are measured up to the point the stream starts.
+# ----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LOGGED_PARAMETERS = 2000
+
+
+class _Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-process request totals, keyed by (method, route, status)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.sql_statements = {}
+        self.sql_seconds = {}
+        self.render_seconds = {}
+        self.slow_queries = 0
+
+    def observe(self, method, route, status, record):
+        with self._lock:
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            route_key = (method, route)
+            self.latency.setdefault(route_key, _Histogram()) \
+                .observe(record['duration'])
+            for totals, value in ((self.sql_statements, record['sql_count']),
+                                  (self.sql_seconds, record['sql_time']),
+                                  (self.render_seconds, record['render_time'])):
+                totals[route_key] = totals.get(route_key, 0) + value
+
+    def slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self, extra=()):
+        """Prometheus text exposition of the totals.
+
+        `extra` adds (name, help, value) gauges, e.g. pool numbers.
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(labels)} {value}')
+
+        with self._lock:
+            metric('fyyur_requests_total', 'counter', 'Requests served.',
+                   [(dict(method=m, route=r, status=s), n)
+                    for (m, r, s), n in sorted(self.requests.items())])
+            histogram = []
+            for (m, r), h in sorted(self.latency.items()):
+                cumulative = 0
+                bounds = [str(b) for b in h.buckets] + ['+Inf']
+                for bound, count in zip(bounds, h.counts):
+                    cumulative += count
+                    histogram.append((dict(method=m, route=r, le=bound),
+                                      cumulative, '_bucket'))
+                histogram.append((dict(method=m, route=r), round(h.total, 6), '_sum'))
+                histogram.append((dict(method=m, route=r), h.count, '_count'))
+            lines.append('# HELP fyyur_request_duration_seconds Request latency.')
+            lines.append('# TYPE fyyur_request_duration_seconds histogram')
+            for labels, value, suffix in histogram:
+                lines.append(f'fyyur_request_duration_seconds{suffix}'
+                             f'{_labels(labels)} {value}')
+            for name, help_text, totals in (
+                    ('fyyur_sql_statements_total', 'SQL statements issued.',
+                     self.sql_statements),
+                    ('fyyur_sql_seconds_total', 'Time spent in SQL statements.',
+                     self.sql_seconds),
+                    ('fyyur_template_render_seconds_total',
+                     'Time spent rendering templates.', self.render_seconds)):
+                metric(name, 'counter', help_text,
+                       [(dict(method=m, route=r), round(v, 6))
+                        for (m, r), v in sorted(totals.items())])
+            metric('fyyur_slow_queries_total', 'counter',
+                   'Statements slower than SLOW_QUERY_SECONDS.',
+                   [({}, self.slow_queries)])
+        for name, help_text, value in extra:
+            metric(name, 'gauge', help_text, [({}, value)])
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    body = ','.join('{}="{}"'.format(
+        k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in labels.items())
+    return '{' + body + '}'
+
+
+class _JSONLFormatter(logging.Formatter):
+    def format(self, record):
+        return record.getMessage()
+
+
+class RequestMetrics:
+    """Flask extension wiring the request, SQL and template hooks.
+
+    The registry and the JSONL logger (None without a REQUEST_LOG) live in
+    app.extensions['request_metrics'].
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        logger = None
+        path = app.config.get('REQUEST_LOG')
+        if path:
+            logger = logging.getLogger(f'fyyur.metrics.{id(app)}')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = logging.FileHandler(path, delay=True)
+            handler.setFormatter(_JSONLFormatter())
+            logger.addHandler(handler)
+        app.extensions['request_metrics'] = (MetricsRegistry(), logger)
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        _listen_once()
+
+    @property
+    def registry(self):
+        return current_app.extensions['request_metrics'][0]
+
+
+def _state():
+    return current_app.extensions.get('request_metrics')
+
+
+def _log(logger, record):
+    if logger is not None:
+        logger.info(json.dumps(record, default=str))
+
+
+def _start_request():
+    g.request_metrics = {'start': time.perf_counter(), 'sql_count': 0,
+                         'sql_time': 0.0, 'render_time': 0.0}
+
+
+def _finish_request(response):
+    current = g.pop('request_metrics', None)
+    state = _state()
+    if current is None or state is None:
+        return response
+    registry, logger = state
+    duration = time.perf_counter() - current.pop('start')
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    record = dict(current, duration=duration)
+    registry.observe(request.method, route, response.status_code, record)
+    _log(logger, {'event': 'request',
+                  'time': datetime.utcnow().isoformat(),
+                  'method': request.method,
+                  'path': request.full_path.rstrip('?'),
+                  'route': route,
+                  'endpoint': request.endpoint,
+                  'status': response.status_code,
+                  'duration_ms': round(duration * 1000, 3),
+                  'render_ms': round(current['render_time'] * 1000, 3),
+                  'sql_count': current['sql_count'],
+                  'sql_ms': round(current['sql_time'] * 1000, 3)})
+    response.headers['Server-Timing'] = \
+        f'app;dur={duration * 1000:.1f}, db;dur={current["sql_time"] * 1000:.1f}'
+    return response
+
+
+# ----------------------------------------------------------------------------#
+# SQL and template hooks.
+# ----------------------------------------------------------------------------#
+
+_listening = False
+
+
+def _listen_once():
+    global _listening
+    if _listening:
+        return
+    _listening = True
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    if signals_available:
+        before_render_template.connect(_before_render)
+        template_rendered.connect(_after_render)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if not has_app_context():
+        return
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics['sql_count'] += 1
+        g.request_metrics['sql_time'] += elapsed
+    threshold = current_app.config.get('SLOW_QUERY_SECONDS')
+    state = _state()
+    if threshold is None or elapsed < threshold or state is None:
+        return
+    registry, logger = state
+    registry.slow_query()
+    params = json.dumps(parameters, default=str)
+    if len(params) > MAX_LOGGED_PARAMETERS:
+        params = params[:MAX_LOGGED_PARAMETERS] + '...'
+    path = request.full_path.rstrip('?') if has_request_context() else None
+    if logger is None:
+        current_app.logger.warning(
+            'slow query (%.1f ms) on %s: %s; parameters: %s',
+            elapsed * 1000, path, statement, params)
+        return
+    _log(logger, {'event': 'slow_query',
+                  'time': datetime.utcnow().isoformat(),
+                  'path': path,
+                  'duration_ms': round(elapsed * 1000, 3),
+                  'statement': statement,
+                  'parameters': params,
+                  'executemany': executemany})
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and 'request_metrics' in g:
+        g.setdefault('render_starts', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get('render_starts') if has_request_context() else None
+    if starts and 'request_metrics' in g:
+        g.request_metrics['render_time'] += time.perf_counter() - starts.pop()
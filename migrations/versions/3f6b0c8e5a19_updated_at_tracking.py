@@ -0,0 +1,35 @@
+"""updated_at tracking
+
+Revision ID: 3f6b0c8e5a19
+Revises: e41a7d0c92b8
+Create Date: 2026-10-17 11:26:08.731455
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b0c8e5a19'
+down_revision = 'e41a7d0c92b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are stamped with the migration time (UTC).
+    for table in ('venues', 'artists', 'shows'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'updated_at', sa.DateTime(), nullable=False,
+                server_default=sa.text("timezone('utc', now())")))
+            batch_op.create_index(f'ix_{table}_updated_at', ['updated_at'], unique=False)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', server_default=None)
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_updated_at')
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,38 @@
+"""venue area summary
+
+Revision ID: 9a4c7e2d5b10
+Revises: 3f6b0c8e5a19
+Create Date: 2026-10-17 12:14:40.318227
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e2d5b10'
+down_revision = '3f6b0c8e5a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Must stay in step with summary.AREA_SUMMARY_SQL. The unique index is
+    # what allows REFRESH MATERIALIZED VIEW CONCURRENTLY.
+    op.execute("""
+        CREATE MATERIALIZED VIEW venue_area_summary AS
+        SELECT v.state, v.city, v.id AS venue_id, v.name AS venue_name,
+               count(s.id) FILTER (WHERE s.start_time > localtimestamp)
+                   AS num_upcoming_shows,
+               localtimestamp AS refreshed_at
+        FROM venues v LEFT JOIN shows s ON s.venue_id = v.id
+        GROUP BY v.id
+    """)
+    op.execute('CREATE UNIQUE INDEX ix_venue_area_summary_venue_id '
+               'ON venue_area_summary (venue_id)')
+    op.execute('CREATE INDEX ix_venue_area_summary_area '
+               'ON venue_area_summary (state, city, venue_name, venue_id)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS venue_area_summary')
@@ -0,0 +1,40 @@
+"""search trigram indexes
+
+Revision ID: b5d81e3c6f27
+Revises: 7c2e9f4a1b3d
+Create Date: 2026-10-17 10:03:12.560931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d81e3c6f27'
+down_revision = '7c2e9f4a1b3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Must stay in step with search.search_text() and search.SEARCH_DDL.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_text(
+            name text, city text, state text, genres text[]
+        ) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '')
+                         || ', ' || coalesce(state, '') || ' '
+                         || coalesce(array_to_string(genres, ' '), ''))
+        $$
+    """)
+    op.execute('CREATE INDEX ix_venues_search_trgm ON venues USING gin '
+               '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_artists_search_trgm ON artists USING gin '
+               '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_artists_search_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_venues_search_trgm')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_text(text, text, text, text[])')
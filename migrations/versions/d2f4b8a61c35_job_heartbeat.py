@@ -0,0 +1,27 @@
+"""job heartbeat
+
+Revision ID: d2f4b8a61c35
+Revises: c83f1d6a0e47
+Create Date: 2026-10-17 16:20:11.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f4b8a61c35'
+down_revision = 'c83f1d6a0e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(),
+                                      nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
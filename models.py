@@ -1,12 +1,56 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, and_, select
+from sqlalchemy import func, select
 from sqlalchemy.ext.hybrid import hybrid_property
 
 db = SQLAlchemy()
 
 
+def show_stats(owner_fk, ids, now=None):
+    """Upcoming/past show counts for many venues or artists at once.
+
+    `owner_fk` is Show.venue_id or Show.artist_id. Returns
+    {id: (upcoming_count, past_count)} with an entry for every id,
+    computed by a single grouped query.
+    """
+    stats = dict.fromkeys(ids, (0, 0))
+    if not stats:
+        return stats
+    rows = db.session.execute(show_stats_stmt(owner_fk, list(stats), now))
+    for owner_id, upcoming, past in rows:
+        stats[owner_id] = (upcoming, past)
+    return stats
+
+
+def show_stats_stmt(owner_fk, ids, now=None):
+    """The grouped (owner id, upcoming, past) query behind show_stats()."""
+    now = now or datetime.now()
+    return select(owner_fk,
+                  func.count(Show.id).filter(Show.start_time > now),
+                  func.count(Show.id).filter(Show.start_time <= now)) \
+        .where(owner_fk.in_(ids)) \
+        .group_by(owner_fk)
+
+
+def _show_tiles(owner_fk, owner_id, other, prefix, condition):
+    query = db.session.query(other.id, other.name, other.image_link,
+                             Show.start_time) \
+        .join(Show, getattr(Show, f'{prefix}_id') == other.id) \
+        .filter(owner_fk == owner_id, condition) \
+        .order_by(Show.start_time)
+    return [{f'{prefix}_id': other_id,
+             f'{prefix}_name': name,
+             f'{prefix}_image_link': image_link,
+             'start_time': str(start_time)}
+            for other_id, name, image_link, start_time in query]
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -20,47 +64,23 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.Text)
     genres = db.Column(db.ARRAY(db.String), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
     shows = db.relationship('Show', backref='venues', lazy=True)
 
-    @hybrid_property
-    def upcoming_shows(self):
-        if self.shows:
-            query = Show.query.filter(and_(Show.start_time > func.now(),
-                                           Show.venue_id == self.id)).all()
-            return [{"artist_id": i.artist_id,
-                     "artist_name": i.artists.name,
-                     "artist_image_link": i.artists.image_link,
-                     "start_time": str(i.start_time)} for i in query]
-        return []
+    @classmethod
+    def _show_fk(cls):
+        return Show.venue_id
 
     @hybrid_property
-    def upcoming_shows_count(self):
-        if self.upcoming_shows:
-            return len(list(self.upcoming_shows))
-        return 0
-
-    @upcoming_shows_count.expression
-    def upcoming_shows_count(cls):
-        return select(func.count(Show.id)). \
-            where(and_(Show.start_time > func.now(), Show.venue_id == cls.id))
+    def upcoming_shows(self):
+        return _show_tiles(Show.venue_id, self.id, Artist, 'artist',
+                           Show.start_time > datetime.now())
 
     @hybrid_property
     def past_shows(self):
-        if self.shows:
-            query = Show.query.filter(and_(Show.start_time < func.now(),
-                                           Show.venue_id == self.id)).all()
-            return [{"artist_id": i.artist_id,
-                     "artist_name": i.artists.name,
-                     "artist_image_link": i.artists.image_link,
-                     "start_time": str(i.start_time)} for i in query]
-        return []
-
-    @hybrid_property
-    def past_shows_count(self):
-        if self.past_shows:
-            return len(list(self.past_shows))
-        return 0
-
+        return _show_tiles(Show.venue_id, self.id, Artist, 'artist',
+                           Show.start_time <= datetime.now())
 
     def __repr__(self):
         return f'Venue: {self.name}'
@@ -68,6 +88,9 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -80,42 +103,24 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
     shows = db.relationship('Show', backref='artists', lazy=True,
                             cascade="all, delete")
 
-    @hybrid_property
-    def upcoming_shows(self):
-        if self.shows:
-            query = Show.query.filter(and_(Show.start_time > func.now(),
-                                           Show.artist_id == self.id)).all()
-            return [{"venue_id": i.venue_id,
-                     "venue_name": i.venues.name,
-                     "venue_image_link": i.venues.image_link,
-                     "start_time": str(i.start_time)} for i in query]
-        return []
+    @classmethod
+    def _show_fk(cls):
+        return Show.artist_id
 
     @hybrid_property
-    def upcoming_shows_count(self):
-        if self.upcoming_shows:
-            return len(list(self.upcoming_shows))
-        return 0
+    def upcoming_shows(self):
+        return _show_tiles(Show.artist_id, self.id, Venue, 'venue',
+                           Show.start_time > datetime.now())
 
     @hybrid_property
     def past_shows(self):
-        if self.shows:
-            query = Show.query.filter(and_(Show.start_time < func.now(),
-                                           Show.artist_id == self.id)).all()
-            return [{"venue_id": i.venue_id,
-                     "venue_name": i.venues.name,
-                     "venue_image_link": i.venues.image_link,
-                     "start_time": str(i.start_time)} for i in query]
-        return []
-
-    @hybrid_property
-    def past_shows_count(self):
-        if self.past_shows:
-            return len(list(self.past_shows))
-        return 0
+        return _show_tiles(Show.artist_id, self.id, Venue, 'venue',
+                           Show.start_time <= datetime.now())
 
     def __repr__(self):
         return f'Artist: {self.name}'
@@ -123,9 +128,46 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id',
                                                    ondelete="CASCADE"))
     start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Job(db.Model):
+    """A queued background operation; see jobs.py."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # last sign of life from the worker running the job
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def as_dict(self):
+        def stamp(value):
+            return value.isoformat() if value else None
+        return {'id': self.id, 'kind': self.kind, 'status': self.status,
+                'result': self.result, 'error': self.error,
+                'created_at': stamp(self.created_at),
+                'started_at': stamp(self.started_at),
+                'finished_at': stamp(self.finished_at)}
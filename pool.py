@@ -0,0 +1,81 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolWaitStats:
+    """Running totals of how long checkouts waited on the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS on the instrumented pool, made safe for
+    PgBouncer's transaction pooling when PGBOUNCER_MODE is set."""
+    options = {'poolclass': InstrumentedQueuePool,
+               **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    if config.get('PGBOUNCER_MODE'):
+        # PgBouncer vets its own server connections; a pre-ping would only
+        # test the hop to PgBouncer, at a round trip per checkout.
+        options['pool_pre_ping'] = False
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_driver_name() == 'psycopg':
+            # psycopg 3 prepares statements it sees repeatedly; they would
+            # land on whichever server connection the next transaction gets.
+            options['connect_args'] = {'prepare_threshold': None,
+                                       **options.get('connect_args', {})}
+    return options
+
+
+def pool_stats(engine):
+    """Live numbers for the engine's pool, as a plain dict."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(),
+                     checked_in=pool.checkedin(),
+                     checked_out=pool.checkedout(),
+                     overflow=max(pool.overflow(), 0),
+                     max_overflow=pool._max_overflow)
+    wait = getattr(pool, 'wait_stats', None)
+    if wait is not None:
+        stats.update(checkouts=wait.checkouts,
+                     timeouts=wait.timeouts,
+                     wait_seconds_total=round(wait.wait_total, 6),
+                     wait_seconds_max=round(wait.wait_max, 6),
+                     wait_seconds_avg=round(wait.wait_total / wait.checkouts, 6)
+                     if wait.checkouts else 0.0)
+    return stats
@@ -0,0 +1,524 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, true, literal_column, tuple_, cast, \
+    Date
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from models import db, Venue, Artist, Show, show_stats
+from search import search
+from summary import area_summary, summary_enabled, summary_version, \
+    ensure_fresh
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor', 'per_page'])
+
+
+def page_args(args):
+    """Keyset pagination parameters from a request's query string."""
+    return {'after': args.get('after'),
+            'before': args.get('before'),
+            'per_page': args.get('per_page', type=int)}
+
+
+def page_size(requested=None):
+    """Clamp a requested page size to PAGE_SIZE/MAX_PAGE_SIZE from config."""
+    default = current_app.config.get('PAGE_SIZE', 50)
+    limit = current_app.config.get('MAX_PAGE_SIZE', 200)
+    if not requested or requested < 1:
+        return default
+    return min(requested, limit)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v
+                      for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, keys):
+    """Turn a cursor back into key values, or None if it is malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if len(values) != len(keys):
+            return None
+        return [datetime.fromisoformat(v) if key.type.python_type is datetime
+                else key.type.python_type(v) for key, v in zip(keys, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+_Seek = namedtuple('_Seek', ['names', 'after', 'before', 'per_page'])
+
+
+def keyset_query(stmt, keys, after=None, before=None, per_page=None):
+    """`stmt` limited to one page past a cursor, plus what keyset_result()
+    needs to turn its rows into a Page.
+
+    keyset_page() runs the statement on db.session; aio.py awaits it on an
+    async connection instead.
+    """
+    per_page = page_size(per_page)
+    names = [key.key for key in keys]
+    after = decode_cursor(after, keys)
+    before = decode_cursor(before, keys) if after is None else None
+    if before is not None:
+        stmt = stmt.where(tuple_(*keys) < tuple_(*before)) \
+            .order_by(*[key.desc() for key in keys])
+    else:
+        if after is not None:
+            stmt = stmt.where(tuple_(*keys) > tuple_(*after))
+        stmt = stmt.order_by(*keys)
+    return stmt.limit(per_page + 1), _Seek(names, after, before, per_page)
+
+
+def keyset_result(rows, seek):
+    """The Page for a list of mapping rows fetched by a keyset_query()."""
+    more = len(rows) > seek.per_page
+    rows = rows[:seek.per_page]
+    if seek.before is not None:
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, seek.after is not None
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor([rows[-1][name] for name in seek.names])
+    if rows and has_prev:
+        prev_cursor = encode_cursor([rows[0][name] for name in seek.names])
+    return Page(rows, next_cursor, prev_cursor, seek.per_page)
+
+
+def keyset_page(stmt, keys, after=None, before=None, per_page=None):
+    """Fetch one page of `stmt` ordered by `keys`, seeking past a cursor.
+
+    `keys` must be selected columns that uniquely order the rows, e.g.
+    (Show.start_time, Show.id). `after` moves forward from a next_cursor,
+    `before` moves back from a prev_cursor. Cost depends only on page size.
+    """
+    stmt, seek = keyset_query(stmt, keys, after, before, per_page)
+    return keyset_result(db.session.execute(stmt).mappings().all(), seek)
+
+
+# ----------------------------------------------------------------------------#
+# Detail pages.
+# ----------------------------------------------------------------------------#
+
+def _show_list(other, other_prefix, condition, order, name):
+    # The json list of show tiles matching `condition`, and their count.
+    tile = func.json_build_object(
+        f'{other_prefix}_id', other.id,
+        f'{other_prefix}_name', other.name,
+        f'{other_prefix}_image_link', other.image_link,
+        'start_time', Show.start_time
+    )
+    return (
+        func.coalesce(
+            func.json_agg(aggregate_order_by(tile, order)).filter(condition),
+            literal_column("'[]'::json")).label(name),
+        func.count(Show.id).filter(condition).label(f'{name}_count'))
+
+
+def _show_lists(owner_fk, owner_id, other, other_prefix, *lists):
+    return select(*[column for args in lists
+                    for column in _show_list(other, other_prefix, *args)]) \
+        .select_from(Show) \
+        .join(other, other.id == getattr(Show, f'{other_prefix}_id')) \
+        .where(owner_fk == owner_id)
+
+
+def _upcoming(now):
+    return Show.start_time > now, Show.start_time, 'upcoming_shows'
+
+
+def _past(now):
+    return Show.start_time <= now, Show.start_time.desc(), 'past_shows'
+
+
+def _shows_aggregate(owner_fk, owner_id, other, other_prefix, now):
+    # One lateral row holding the upcoming/past show lists and their counts
+    # for a single venue or artist, split on the same `now` boundary.
+    return _show_lists(owner_fk, owner_id, other, other_prefix,
+                       _upcoming(now), _past(now)) \
+        .lateral(f'{other_prefix}_shows')
+
+
+def _detail_args(model):
+    if model is Venue:
+        return Show.venue_id, Artist, 'artist'
+    return Show.artist_id, Venue, 'venue'
+
+
+def _detail(model, owner_fk, other, other_prefix, entity_id, now):
+    shows = _shows_aggregate(owner_fk, model.id, other, other_prefix, now)
+    stmt = select(model.__table__, shows) \
+        .select_from(model.__table__) \
+        .join(shows, true()) \
+        .where(model.id == entity_id)
+    row = db.session.execute(stmt).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def detail_statements(model, entity_id, now=None):
+    """The venue/artist row, its upcoming shows and its past shows as three
+    independent statements.
+
+    Merged, their rows are what venue_detail()/artist_detail() return; the
+    async read path (aio.py) runs them concurrently.
+    """
+    owner_fk, other, other_prefix = _detail_args(model)
+    now = now or datetime.now()
+    return (select(model.__table__).where(model.id == entity_id),
+            *[_show_lists(owner_fk, entity_id, other, other_prefix, shows)
+              .where(shows[0])
+              for shows in (_upcoming(now), _past(now))])
+
+
+def venue_detail(venue_id, now=None):
+    """Return the show_venue payload in one round trip, or None."""
+    return _detail(Venue, Show.venue_id, Artist, 'artist', venue_id,
+                   now or datetime.now())
+
+
+def artist_detail(artist_id, now=None):
+    """Return the show_artist payload in one round trip, or None."""
+    return _detail(Artist, Show.artist_id, Venue, 'venue', artist_id,
+                   now or datetime.now())
+
+
+# ----------------------------------------------------------------------------#
+# Conditional GET validators.
+#
+# Each returns (last_modified, token) for a page without running its show
+# queries, or None when the entity does not exist. The token covers what
+# updated_at cannot: row counts that change on delete and, for detail
+# pages, how many shows have already moved from upcoming to past.
+# ----------------------------------------------------------------------------#
+
+def _detail_validator(model, owner_fk, other, other_prefix, entity_id, now):
+    other_fk = getattr(Show, f'{other_prefix}_id')
+    row = db.session.execute(
+        select(model.updated_at,
+               func.max(Show.updated_at),
+               func.max(other.updated_at),
+               func.count(Show.id),
+               func.count(Show.id).filter(Show.start_time <= now))
+        .select_from(model)
+        .outerjoin(Show, owner_fk == model.id)
+        .outerjoin(other, other.id == other_fk)
+        .where(model.id == entity_id)
+        .group_by(model.id, model.updated_at)).first()
+    if row is None:
+        return None
+    last_modified = max(stamp for stamp in row[:3] if stamp is not None)
+    return last_modified, f'{row[3]}:{row[4]}'
+
+
+def venue_validator(venue_id, now=None):
+    return _detail_validator(Venue, Show.venue_id, Artist, 'artist', venue_id,
+                             now or datetime.now())
+
+
+def artist_validator(artist_id, now=None):
+    return _detail_validator(Artist, Show.artist_id, Venue, 'venue', artist_id,
+                             now or datetime.now())
+
+
+def catalog_validator(now=None):
+    """Validator for the listing pages, from five index-only lookups.
+
+    Shows are only deleted through their venue, and artists are never
+    deleted, so the venue count is enough to notice deletions. The start
+    of the next upcoming show changes exactly when a show moves from
+    upcoming to past, which is when the listings' upcoming counts change;
+    unlike a count of past shows it is one probe of ix_shows_start_time_id.
+    """
+    now = now or datetime.now()
+    row = db.session.execute(select(
+        select(func.max(Venue.updated_at)).scalar_subquery(),
+        select(func.max(Artist.updated_at)).scalar_subquery(),
+        select(func.max(Show.updated_at)).scalar_subquery(),
+        select(func.count(Venue.id)).scalar_subquery(),
+        select(func.min(Show.start_time)).where(Show.start_time > now)
+        .scalar_subquery())).first()
+    stamps = [stamp for stamp in row[:3] if stamp is not None]
+    return (max(stamps) if stamps else None), f'{row[3]}:{row[4]}'
+
+
+def venue_area_validator(now=None):
+    """Validator for /venues.
+
+    When /venues reads the venue_area_summary view its content only
+    changes when the view is refreshed, so the refresh time is the
+    validator: the live tables change up to AREA_SUMMARY_MAX_AGE earlier.
+    """
+    if not summary_enabled():
+        return catalog_validator(now)
+    ensure_fresh()
+    refreshed_at = summary_version()
+    return refreshed_at, f'summary:{refreshed_at}'
+
+
+def venue_area_version():
+    """Page cache version for /venues: the summary's refresh time, if used."""
+    return summary_version() if summary_enabled() else ''
+
+
+# ----------------------------------------------------------------------------#
+# Show listing.
+# ----------------------------------------------------------------------------#
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name.label('venue_name'),
+    'venue_image_link': Venue.image_link.label('venue_image_link'),
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name.label('artist_name'),
+    'artist_image_link': Artist.image_link.label('artist_image_link'),
+}
+
+SHOW_TILE_FIELDS = ('venue_id', 'venue_name', 'artist_id', 'artist_name',
+                    'artist_image_link', 'start_time')
+
+
+def show_stmt(fields):
+    """Select the named SHOW_FIELDS (plus the id/start_time keyset keys).
+
+    Venues and artists are only joined when one of their columns is asked
+    for.
+    """
+    fields = [f for f in fields if f not in ('id', 'start_time')]
+    stmt = select(Show.id, Show.start_time, *[SHOW_FIELDS[f] for f in fields])
+    if any(f.startswith('venue_') and f != 'venue_id' for f in fields):
+        stmt = stmt.join(Venue, Venue.id == Show.venue_id)
+    if any(f.startswith('artist_') and f != 'artist_id' for f in fields):
+        stmt = stmt.join(Artist, Artist.id == Show.artist_id)
+    return stmt
+
+
+def show_rows_page(stmt, after=None, before=None, per_page=None):
+    """One keyset page of a show_stmt(), ordered by (start_time, id)."""
+    return keyset_page(stmt, [Show.start_time, Show.id], after, before, per_page)
+
+
+def show_page(after=None, before=None, per_page=None, show_filter=None):
+    """One keyset page of /shows, optionally narrowed by a ShowFilter."""
+    stmt = filter_shows(show_stmt(SHOW_TILE_FIELDS), show_filter)
+    page = show_rows_page(stmt, after, before, per_page)
+    return page._replace(items=[dict(row) for row in page.items])
+
+
+# ----------------------------------------------------------------------------#
+# Show calendar.
+#
+# ?start=&end= (inclusive ISO dates) and ?city=&state= narrow /shows and
+# /api/v1/shows. A date range is a range scan on ix_shows_start_time_id; an
+# area resolves its venues through ix_venues_state_city and then ranges over
+# ix_shows_venue_id_start_time, so "this weekend in Austin" only touches
+# that city's shows in that window.
+# ----------------------------------------------------------------------------#
+
+ShowFilter = namedtuple('ShowFilter', ['start', 'end', 'city', 'state'])
+
+
+def show_filter(args):
+    """ShowFilter from a query string, or None when it filters nothing.
+
+    A lone start covers one week and a lone end starts today. Raises
+    ValueError for malformed dates or a range longer than
+    SHOW_CALENDAR_MAX_DAYS.
+    """
+    start, end = args.get('start') or None, args.get('end') or None
+    city, state = args.get('city') or None, args.get('state') or None
+    if not (start or end or city or state):
+        return None
+    try:
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        raise ValueError('start and end must be dates as YYYY-MM-DD')
+    if start and not end:
+        end = start + timedelta(days=6)
+    elif end and not start:
+        start = min(date.today(), end)
+    if start and end:
+        if end < start:
+            raise ValueError('end is before start')
+        limit = current_app.config.get('SHOW_CALENDAR_MAX_DAYS', 366)
+        if (end - start).days + 1 > limit:
+            raise ValueError(f'date range is longer than {limit} days')
+    return ShowFilter(start, end, city, state)
+
+
+def filter_shows(stmt, show_filter):
+    """Restrict a statement over shows to the filter's dates and area."""
+    if show_filter is None:
+        return stmt
+    if show_filter.start:
+        stmt = stmt.where(
+            Show.start_time >= datetime.combine(show_filter.start, time.min))
+    if show_filter.end:
+        stmt = stmt.where(Show.start_time < datetime.combine(
+            show_filter.end + timedelta(days=1), time.min))
+    area = [column == value
+            for column, value in ((Venue.city, show_filter.city),
+                                  (Venue.state, show_filter.state))
+            if value]
+    if area:
+        stmt = stmt.where(Show.venue_id.in_(select(Venue.id).where(*area)))
+    return stmt
+
+
+def show_day_counts_stmt(show_filter):
+    day = cast(Show.start_time, Date).label('day')
+    return filter_shows(select(day, func.count(Show.id)), show_filter) \
+        .group_by(day) \
+        .order_by(day)
+
+
+def show_day_counts(show_filter):
+    """[(date, show count)] per day with shows, grouped in the database."""
+    return [(row[0], row[1])
+            for row in db.session.execute(show_day_counts_stmt(show_filter))]
+
+
+# ----------------------------------------------------------------------------#
+# Artist and venue listings.
+# ----------------------------------------------------------------------------#
+
+DETAIL_SHOW_FIELDS = ('upcoming_shows', 'upcoming_shows_count',
+                      'past_shows', 'past_shows_count')
+
+
+def entity_fields(model):
+    """Column name -> column for a venue or artist."""
+    return {column.key: column for column in model.__table__.columns}
+
+
+def entity_page(model, fields, after=None, before=None, per_page=None):
+    """One keyset page of venue/artist rows with only `fields`, by id."""
+    columns = entity_fields(model)
+    stmt = select(model.id, *[columns[f] for f in fields if f != 'id'])
+    return keyset_page(stmt, [model.id], after, before, per_page)
+
+
+def entity_row(model, entity_id, fields):
+    """One venue/artist as a dict of `fields`, or None.
+
+    Asking for any DETAIL_SHOW_FIELDS goes through venue_detail() or
+    artist_detail(); otherwise only the requested columns are selected.
+    """
+    if any(f in DETAIL_SHOW_FIELDS for f in fields):
+        detail = venue_detail if model is Venue else artist_detail
+        row = detail(entity_id)
+    else:
+        columns = entity_fields(model)
+        row = db.session.execute(
+            select(*[columns[f] for f in fields])
+            .where(model.id == entity_id)).mappings().first()
+    if row is None:
+        return None
+    return {f: row[f] for f in fields}
+
+
+def artist_page(after=None, before=None, per_page=None):
+    """One keyset page of /artists, ordered by (name, id)."""
+    return keyset_page(select(Artist.id, Artist.name), [Artist.name, Artist.id],
+                       after, before, per_page)
+
+
+def venue_area_page(after=None, before=None, per_page=None):
+    """One keyset page of city/state areas for /venues.
+
+    Pages are counted in areas, ordered by (state, city); each area carries
+    all of its venues and their upcoming show counts. Read from the
+    venue_area_summary view when it is enabled (see summary.py).
+    """
+    summary = summary_enabled()
+    if summary:
+        ensure_fresh()
+    keys = area_keys(summary)
+    page = keyset_page(select(*keys).group_by(*keys), keys,
+                       after, before, per_page)
+    if not page.items:
+        return page
+    rows = db.session.execute(area_venues_stmt(summary, area_list(page))).all()
+    if not summary:
+        stats = show_stats(Show.venue_id, [row.id for row in rows])
+        rows = [(*row, stats[row.id][0]) for row in rows]
+    return area_page(page, rows)
+
+
+def area_keys(summary):
+    """The (state, city) keyset columns, from the view or from venues."""
+    if summary:
+        return [area_summary.c.state, area_summary.c.city]
+    return [Venue.state, Venue.city]
+
+
+def area_list(page):
+    return [(row['state'], row['city']) for row in page.items]
+
+
+def area_venues_stmt(summary, areas):
+    """Venues in `areas` by name; the view's rows include upcoming counts."""
+    if summary:
+        s = area_summary.c
+        return select(s.venue_id, s.venue_name, s.state, s.city,
+                      s.num_upcoming_shows) \
+            .where(tuple_(s.state, s.city).in_(areas)) \
+            .order_by(s.venue_name, s.venue_id)
+    return select(Venue.id, Venue.name, Venue.state, Venue.city) \
+        .where(tuple_(Venue.state, Venue.city).in_(areas)) \
+        .order_by(Venue.name, Venue.id)
+
+
+def area_page(page, venues):
+    """Group (id, name, state, city, upcoming) rows under the page's areas."""
+    areas = {(row['state'], row['city']): {'city': row['city'],
+                                           'state': row['state'],
+                                           'venues': []}
+             for row in page.items}
+    for venue_id, name, venue_state, venue_city, upcoming in venues:
+        areas[(venue_state, venue_city)]['venues'].append({
+            'id': venue_id,
+            'name': name,
+            'num_upcoming_shows': upcoming
+        })
+    return page._replace(items=list(areas.values()))
+
+
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
+
+def _search(model, term):
+    rows = search(model, term)
+    stats = show_stats(model._show_fk(), [entity_id for entity_id, _ in rows])
+    data = [{'id': entity_id,
+             'name': name,
+             'num_upcoming_shows': stats[entity_id][0]}
+            for entity_id, name in rows]
+    return {'count': len(data), 'data': data}
+
+
+def find_venues(term):
+    """search_venues results with upcoming counts, in two queries total."""
+    return _search(Venue, term)
+
+
+def find_artists(term):
+    """search_artists results with upcoming counts, in two queries total."""
+    return _search(Artist, term)
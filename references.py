@@ -0,0 +1,104 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import select, exists
+
+from commit_queue import CommitQueue
+from models import db, Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+# Known venue/artist ids for form validation.
+#
+# ShowForm checks its venue_id/artist_id against a sorted array of every
+# venue and artist id, loaded once per process (8 bytes an id) and kept in
+# step with this process's committed writes. An id missing from the array
+# is looked up by primary key before it is rejected, since another worker
+# may have created it; an id another worker deleted still passes and is
+# caught by the foreign key on insert, as before.
+# ----------------------------------------------------------------------------#
+
+
+class IdSet:
+    """Sorted array of ids with binary-search membership."""
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(ids))
+
+    def __contains__(self, entity_id):
+        i = bisect_left(self.ids, entity_id)
+        return i < len(self.ids) and self.ids[i] == entity_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, entity_id):
+        i = bisect_left(self.ids, entity_id)
+        if i == len(self.ids) or self.ids[i] != entity_id:
+            self.ids.insert(i, entity_id)
+
+    def discard(self, entity_id):
+        i = bisect_left(self.ids, entity_id)
+        if i < len(self.ids) and self.ids[i] == entity_id:
+            del self.ids[i]
+
+
+_known = {}
+_lock = threading.Lock()
+
+
+def known_ids(model):
+    """The IdSet for `model`, loaded with one ordered id scan if needed."""
+    ids = _known.get(model.__tablename__)
+    if ids is None:
+        ids = IdSet(db.session.scalars(select(model.id).order_by(model.id)))
+        with _lock:
+            ids = _known.setdefault(model.__tablename__, ids)
+    return ids
+
+
+def id_exists(model, entity_id):
+    """True if a venue/artist with this id exists, usually without a query."""
+    ids = known_ids(model)
+    if entity_id in ids:
+        return True
+    found = db.session.scalar(select(model.id).where(model.id == entity_id))
+    if found is not None:
+        with _lock:
+            ids.add(found)
+    return found is not None
+
+
+def venue_booked(venue_id, start_time):
+    """Whether the venue already has a show at exactly `start_time`.
+
+    One probe of ix_shows_venue_id_start_time.
+    """
+    return db.session.scalar(select(exists().where(
+        Show.venue_id == venue_id, Show.start_time == start_time)))
+
+
+def invalidate(model):
+    with _lock:
+        _known.pop(model.__tablename__, None)
+
+
+def _apply(change):
+    table, entity_id, present = change
+    ids = _known.get(table)
+    if ids is None:
+        return
+    with _lock:
+        if present:
+            ids.add(entity_id)
+        else:
+            ids.discard(entity_id)
+
+
+# Updates never change an id, so only inserts and deletes are tracked.
+_writes = CommitQueue('references', (Venue, Artist), _apply, invalidate,
+                      bulk=('insert', 'delete'))
+_writes.listen('after_insert',
+               lambda target: (type(target).__tablename__, target.id, True))
+_writes.listen('after_delete',
+               lambda target: (type(target).__tablename__, target.id, False))
@@ -0,0 +1,211 @@
+import re
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import select, func, case, text
+
+from commit_queue import CommitQueue
+from models import db, Venue, Artist
+
+# ----------------------------------------------------------------------------#
+# Venue/artist search.
+#
+# The 'postgres' backend matches every search term against
+# fyyur_search_text(name, city, state, genres), which is covered by a
+# pg_trgm GIN index (see the search_trigram_indexes migration), and ranks by
+# trigram similarity of the name. The 'memory' backend answers the same
+# queries from an in-process trigram inverted index so that search works
+# without Postgres, e.g. against SQLite in tests.
+# ----------------------------------------------------------------------------#
+
+
+# Must stay in step with the search_trigram_indexes migration and with
+# search_text() below.
+SEARCH_DDL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    CREATE OR REPLACE FUNCTION fyyur_search_text(
+        name text, city text, state text, genres text[]
+    ) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '')
+                     || ', ' || coalesce(state, '') || ' '
+                     || coalesce(array_to_string(genres, ' '), ''))
+    $$
+    """,
+    'CREATE INDEX IF NOT EXISTS ix_venues_search_trgm ON venues USING gin '
+    '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_artists_search_trgm ON artists USING gin '
+    '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)',
+)
+
+
+def create_search_objects(connection):
+    """Create pg_trgm, fyyur_search_text() and the trigram indexes if
+    missing (used by `flask init-db`)."""
+    for ddl in SEARCH_DDL:
+        connection.execute(text(ddl))
+
+
+def search_text(name, city, state, genres):
+    """Python twin of the fyyur_search_text() SQL function."""
+    return f"{name or ''} {city or ''}, {state or ''} " \
+           f"{' '.join(genres or [])}".lower()
+
+
+def search_terms(term):
+    return (term or '').lower().split()
+
+
+def trigrams(text):
+    """Trigram set as computed by pg_trgm's similarity()."""
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def contains_pattern(term):
+    """LIKE pattern matching `term` anywhere, with % and _ taken literally.
+
+    Built as one literal (rather than with .contains(autoescape=True), which
+    concatenates in SQL) so the planner can use the trigram index on it.
+    """
+    term = term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+    return f'%{term}%'
+
+
+def result_limit(limit=None):
+    return limit or current_app.config.get('SEARCH_RESULT_LIMIT', 50)
+
+
+# ----------------------------------------------------------------------------#
+# Postgres backend.
+# ----------------------------------------------------------------------------#
+
+def search_stmt(model, term, limit=None):
+    """The ranked (id, name) query the 'postgres' backend runs."""
+    limit = result_limit(limit)
+    terms = search_terms(term)
+    text = func.fyyur_search_text(model.name, model.city, model.state,
+                                  model.genres)
+    term = term or ''
+    name_match = case(
+        (model.name.ilike(contains_pattern(term), escape='/'), 1), else_=0)
+    # A blank term has no conditions and lists everything, like the memory
+    # backend.
+    return select(model.id, model.name) \
+        .where(*[text.like(contains_pattern(t), escape='/') for t in terms]) \
+        .order_by(name_match.desc(),
+                  func.similarity(model.name, term).desc(),
+                  model.name, model.id) \
+        .limit(limit)
+
+
+def _postgres_search(model, term, limit):
+    return [(row.id, row.name)
+            for row in db.session.execute(search_stmt(model, term, limit))]
+
+
+# ----------------------------------------------------------------------------#
+# In-process backend.
+# ----------------------------------------------------------------------------#
+
+class MemorySearchIndex:
+    """Trigram inverted index over (id, name, city, state, genres) rows."""
+
+    def __init__(self, rows=()):
+        self.rebuild(rows)
+
+    def rebuild(self, rows):
+        self.names = {}
+        self.texts = {}
+        self.postings = defaultdict(set)
+        for row in rows:
+            self.add(*row)
+
+    def add(self, entity_id, name, city, state, genres):
+        self.remove(entity_id)
+        text = search_text(name, city, state, genres)
+        self.names[entity_id] = name
+        self.texts[entity_id] = text
+        for i in range(len(text) - 2):
+            self.postings[text[i:i + 3]].add(entity_id)
+
+    def remove(self, entity_id):
+        text = self.texts.pop(entity_id, None)
+        self.names.pop(entity_id, None)
+        if text is None:
+            return
+        for i in range(len(text) - 2):
+            self.postings[text[i:i + 3]].discard(entity_id)
+
+    def _candidates(self, word):
+        if len(word) < 3:
+            return set(self.texts)
+        ids = None
+        for i in range(len(word) - 2):
+            posting = self.postings.get(word[i:i + 3], set())
+            ids = posting if ids is None else ids & posting
+            if not ids:
+                return set()
+        return ids
+
+    def search(self, term, limit):
+        terms = search_terms(term)
+        ids = set(self.texts)
+        for word in terms:
+            ids &= self._candidates(word)
+            ids = {i for i in ids if word in self.texts[i]}
+        needle = (term or '').lower()
+
+        def rank(entity_id):
+            name = self.names[entity_id]
+            return (needle not in name.lower(), -similarity(name, term or ''),
+                    name, entity_id)
+
+        return [(i, self.names[i]) for i in sorted(ids, key=rank)[:limit]]
+
+
+_memory_indexes = {}
+
+
+def memory_index(model):
+    """The in-process index for `model`, rebuilt after any committed write
+    to it."""
+    index = _memory_indexes.get(model.__tablename__)
+    if index is None:
+        rows = db.session.execute(
+            select(model.id, model.name, model.city, model.state,
+                   model.genres)).all()
+        index = _memory_indexes[model.__tablename__] = MemorySearchIndex(rows)
+    return index
+
+
+def invalidate(model):
+    _memory_indexes.pop(model.__tablename__, None)
+
+
+# A rolled-back write leaves the index alone.
+_writes = CommitQueue('search', (Venue, Artist), invalidate, invalidate)
+for _name in ('after_insert', 'after_update', 'after_delete'):
+    _writes.listen(_name, type)
+
+
+# ----------------------------------------------------------------------------#
+# Entry point.
+# ----------------------------------------------------------------------------#
+
+def search(model, term, limit=None):
+    """Ranked (id, name) matches for `term`, at most SEARCH_RESULT_LIMIT."""
+    limit = result_limit(limit)
+    if current_app.config.get('SEARCH_BACKEND', 'postgres') == 'memory':
+        return memory_index(model).search(term, limit)
+    return _postgres_search(model, term, limit)
@@ -0,0 +1,43 @@
+// Name pickers on the new-show form: typing in an input with
+// data-typeahead fills its datalist from the names endpoint, and picking a
+// suggestion copies its id into the data-target field.
+const ID_SUFFIX = /\(#(\d+)\)$/;
+
+$( "input[data-typeahead]" ).each(function() {
+  const input = $(this);
+  const list = $('#' + input.attr('list'));
+  const target = $(input.data('target'));
+  let timer = null;
+  let latest = 0;
+
+  async function suggest(term) {
+    const request = ++latest;
+    try {
+      const response = await fetch(input.data('typeahead') + '?q=' + encodeURIComponent(term));
+      const names = (await response.json()).data;
+      if (request !== latest) {
+        // a later keystroke already asked for newer suggestions
+        return;
+      }
+      list.empty();
+      for (const match of names) {
+        list.append($('<option>').attr('value', match.name + ' (#' + match.id + ')'));
+      }
+    } catch(error) {
+      console.log(error)
+    }
+  }
+
+  input.on('input', function() {
+    const picked = ID_SUFFIX.exec(input.val());
+    if (picked) {
+      target.val(picked[1]);
+      return;
+    }
+    clearTimeout(timer);
+    const term = input.val().trim();
+    if (term) {
+      timer = setTimeout(() => suggest(term), 150);
+    }
+  });
+});
@@ -1,9 +1,20 @@
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
 $( "#remove-venue" ).click(async function() {
   const venueId = $(this).data('id');
   try {
     const response = await fetch('/venues/' + venueId, {method: 'DELETE'});
-    if (response.status === 200){
-        window.location.href = '/';
+    if (response.status === 202){
+        // the delete runs as a background job; wait for it to finish
+        const job = await response.json();
+        let status = 'queued';
+        while (status === 'queued' || status === 'running') {
+            await sleep(500);
+            status = (await (await fetch(job.status_url)).json()).status;
+        }
+        if (status === 'done'){
+            window.location.href = '/';
+        }
     }
   } catch(error) {
     console.log(error)
@@ -0,0 +1,195 @@
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, \
+    select, text
+
+from cache import page_cache
+from commit_queue import CommitQueue
+from models import db, Venue, Show
+
+# ----------------------------------------------------------------------------#
+# Materialized city/state -> venue summary for /venues.
+#
+# venue_area_summary holds one row per venue with its area and upcoming
+# show count (see the venue_area_summary migration), so /venues reads
+# precomputed rows instead of grouping venues and counting shows on every
+# request. Every refresh recomputes the whole view with REFRESH
+# MATERIALIZED VIEW CONCURRENTLY, which does not block readers; there is no
+# incremental maintenance. Committed venue/show writes mark the view stale
+# in the writing process, and its next /venues request starts a background
+# thread that refreshes it and then drops the cached /venues pages. A view
+# older than AREA_SUMMARY_MAX_AGE seconds is refreshed as well, which
+# bounds how stale upcoming counts get as shows pass and how long another
+# worker's writes take to show up. Refreshes take a Postgres advisory lock
+# and check the view's refreshed_at once they hold it, so across all
+# workers the view is refreshed about once per AREA_SUMMARY_MAX_AGE plus
+# once per burst of writes, not once per worker. Refreshes are not
+# recorded in the jobs table, since a read path should not write durable
+# rows. `flask refresh-area-summary` refreshes it from a scheduler.
+# ----------------------------------------------------------------------------#
+
+AREA_SUMMARY_VIEW = 'venue_area_summary'
+
+# Arbitrary pg_advisory_xact_lock() key that serializes refreshes across
+# processes.
+AREA_SUMMARY_LOCK = 1613_0013
+
+# Must stay in step with the venue_area_summary migration.
+AREA_SUMMARY_SQL = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {AREA_SUMMARY_VIEW} AS
+    SELECT v.state, v.city, v.id AS venue_id, v.name AS venue_name,
+           count(s.id) FILTER (WHERE s.start_time > localtimestamp)
+               AS num_upcoming_shows,
+           localtimestamp AS refreshed_at
+    FROM venues v LEFT JOIN shows s ON s.venue_id = v.id
+    GROUP BY v.id
+"""
+AREA_SUMMARY_INDEXES = (
+    f'CREATE UNIQUE INDEX IF NOT EXISTS ix_{AREA_SUMMARY_VIEW}_venue_id '
+    f'ON {AREA_SUMMARY_VIEW} (venue_id)',
+    f'CREATE INDEX IF NOT EXISTS ix_{AREA_SUMMARY_VIEW}_area '
+    f'ON {AREA_SUMMARY_VIEW} (state, city, venue_name, venue_id)',
+)
+
+# Kept out of db.metadata so that create_all() does not make it a table.
+area_summary = Table(
+    AREA_SUMMARY_VIEW, MetaData(),
+    Column('state', String(120)),
+    Column('city', String(120)),
+    Column('venue_id', Integer, primary_key=True),
+    Column('venue_name', String),
+    Column('num_upcoming_shows', Integer),
+    Column('refreshed_at', DateTime),
+)
+
+
+class _RefreshState:
+    """Per-app refresh bookkeeping, kept in app.extensions['area_summary']."""
+
+    def __init__(self):
+        self.stale = True
+        self.refreshed_at = None
+        # monotonic time the running refresh started, None when idle
+        self.started_at = None
+        self.lock = threading.Lock()
+
+
+def _state():
+    state = current_app.extensions.get('area_summary')
+    if state is None:
+        state = current_app.extensions.setdefault('area_summary',
+                                                  _RefreshState())
+    return state
+
+
+def summary_enabled():
+    return current_app.config.get('AREA_SUMMARY', True) and \
+        db.engine.dialect.name == 'postgresql'
+
+
+def summary_version():
+    """When the view was last refreshed.
+
+    Every row carries the same refreshed_at, so this reads a single row.
+    """
+    return db.session.scalar(select(area_summary.c.refreshed_at).limit(1))
+
+
+def create_area_summary(connection):
+    """Create the view and its indexes if missing (used by `flask init-db`)."""
+    connection.execute(text(AREA_SUMMARY_SQL))
+    for ddl in AREA_SUMMARY_INDEXES:
+        connection.execute(text(ddl))
+
+
+def refresh_area_summary(max_age=None):
+    """Refresh the view on its own connection, without blocking readers,
+    then drop the /venues pages cached from the old contents.
+
+    Refreshes from all processes queue on AREA_SUMMARY_LOCK. With
+    `max_age`, a refresh that this process has no writes of its own for is
+    skipped when, once it holds the lock, the view turns out to be younger
+    than `max_age` seconds because another worker just refreshed it.
+    Returns whether the view was refreshed.
+    """
+    state = _state()
+    stale, state.stale = state.stale, False
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                               {'key': AREA_SUMMARY_LOCK})
+            age = connection.scalar(text(
+                'SELECT extract(epoch FROM localtimestamp - refreshed_at) '
+                f'FROM {AREA_SUMMARY_VIEW} LIMIT 1'))
+            refresh = stale or max_age is None or age is None or \
+                age > max_age
+            if refresh:
+                connection.execute(text(
+                    f'REFRESH MATERIALIZED VIEW CONCURRENTLY '
+                    f'{AREA_SUMMARY_VIEW}'))
+    except Exception:
+        state.stale = True
+        raise
+    finally:
+        state.started_at = None
+    state.refreshed_at = time.monotonic()
+    if not refresh:
+        state.refreshed_at -= max(float(age), 0.0)
+    # Also after a skip: another worker's refresh changed the view under
+    # this process's cached pages.
+    page_cache.invalidate('venues')
+    return refresh
+
+
+def _refresh_in_background(app, max_age):
+    with app.app_context():
+        try:
+            refresh_area_summary(max_age)
+        except Exception:
+            app.logger.exception('venue_area_summary refresh failed')
+
+
+def ensure_fresh():
+    """Start a refresh when the view is stale or older than AREA_SUMMARY_MAX_AGE.
+
+    The refresh runs on a background thread; requests keep reading the
+    current contents meanwhile. At most one refresh per app runs at a
+    time, but one that has not finished within AREA_SUMMARY_MAX_AGE no
+    longer holds the next one back, so a refresh that never reports back
+    cannot stop them for good.
+    """
+    state = _state()
+    max_age = current_app.config.get('AREA_SUMMARY_MAX_AGE', 60)
+    now = time.monotonic()
+    expired = state.refreshed_at is None or \
+        now - state.refreshed_at > max_age
+    if not (state.stale or expired):
+        return
+    with state.lock:
+        if state.started_at is not None and \
+                now - state.started_at <= max_age:
+            return
+        state.started_at = now
+    try:
+        threading.Thread(target=_refresh_in_background,
+                         args=(current_app._get_current_object(), max_age),
+                         name='fyyur-area-summary', daemon=True).start()
+    except Exception:
+        state.started_at = None
+        raise
+
+
+def mark_stale():
+    if has_app_context():
+        _state().stale = True
+
+
+# Writes only mark the view stale once committed, so a refresh cannot run
+# ahead of the transaction that changed the data.
+_writes = CommitQueue('area_summary', (Venue, Show),
+                      apply=lambda change: mark_stale(),
+                      reload=lambda model: mark_stale())
+for _name in ('after_insert', 'after_update', 'after_delete'):
+    _writes.listen(_name, lambda target: True)
@@ -0,0 +1,73 @@
+import pytest
+from flask import template_rendered
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+from benchmarks.util import StatementCounter
+
+# SQLite stand-ins for the tables the tests touch: the models' ARRAY
+# columns keep create_all() Postgres-only, so genres are plain text here.
+SCHEMA = (
+    """CREATE TABLE venues (
+        id INTEGER PRIMARY KEY, name VARCHAR, city VARCHAR(120),
+        state VARCHAR(120), address VARCHAR(120), phone VARCHAR(120),
+        image_link VARCHAR(500), facebook_link VARCHAR(120), genres TEXT,
+        website VARCHAR(120), seeking_talent BOOLEAN,
+        seeking_description VARCHAR, created_at DATETIME,
+        updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE artists (
+        id INTEGER PRIMARY KEY, name VARCHAR, city VARCHAR(120),
+        state VARCHAR(120), phone VARCHAR(120), image_link VARCHAR(500),
+        facebook_link VARCHAR(120), genres TEXT, website VARCHAR(120),
+        seeking_venue BOOLEAN, seeking_description VARCHAR,
+        created_at DATETIME, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE shows (
+        id INTEGER PRIMARY KEY, venue_id INTEGER NOT NULL,
+        artist_id INTEGER NOT NULL, start_time DATETIME NOT NULL,
+        created_at DATETIME, updated_at DATETIME NOT NULL)""",
+    """CREATE TABLE jobs (
+        id INTEGER PRIMARY KEY, kind VARCHAR(64) NOT NULL,
+        payload JSON NOT NULL, status VARCHAR(16) NOT NULL, result JSON,
+        error TEXT, attempts INTEGER NOT NULL, created_at DATETIME NOT NULL,
+        started_at DATETIME, heartbeat_at DATETIME, finished_at DATETIME)""",
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True,
+                      'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                      'SQLALCHEMY_ENGINE_OPTIONS': {},
+                      'CACHE_BACKEND': 'null',
+                      'SEARCH_BACKEND': 'memory',
+                      'REQUEST_LOG': ''})
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for ddl in SCHEMA:
+                connection.execute(text(ddl))
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    """Counts the SQL statements sent while the test runs."""
+    with StatementCounter(db.engine) as counter:
+        yield counter
+
+
+@pytest.fixture
+def rendered(app):
+    """Names of the templates rendered while the test runs."""
+    names = []
+
+    def on_render(sender, template, context, **extra):
+        names.append(template.name)
+    with template_rendered.connected_to(on_render, app):
+        yield names
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import models
+import queries
+from cache import MemoryCache
+from models import db
+
+STAMP = '2030-01-01 00:00:00.000000'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Pins datetime.now() in the queries and models modules."""
+    class Clock(datetime):
+        current = datetime(2030, 1, 1, 12)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(queries, 'datetime', Clock)
+    monkeypatch.setattr(models, 'datetime', Clock)
+    return Clock
+
+
+@pytest.fixture
+def catalog(app):
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO venues (id, name, city, state, updated_at) "
+            f"VALUES (1, 'The Musical Hop', 'San Francisco', 'CA', '{STAMP}')"))
+        connection.execute(text(
+            "INSERT INTO artists (id, name, city, state, updated_at) "
+            f"VALUES (1, 'Guns N Petals', 'San Francisco', 'CA', '{STAMP}')"))
+        connection.execute(text(
+            "INSERT INTO shows (venue_id, artist_id, start_time, updated_at) "
+            f"VALUES (1, 1, '2030-01-01 20:00:00.000000', '{STAMP}')"))
+
+
+@pytest.mark.parametrize('path', ['/venues', '/api/v1/venues'])
+def test_listing_revalidates_once_a_show_passes(client, clock, catalog,
+                                                path):
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get(path, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+
+    # Nothing was written, but the 20:00 show is no longer upcoming.
+    clock.current = datetime(2030, 1, 1, 21)
+    after = client.get(path, headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+
+
+@pytest.fixture
+def summary_view(app, catalog, monkeypatch):
+    """/venues reading a venue_area_summary stand-in, with refreshes done
+    by hand and a memory page cache."""
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE venue_area_summary (state VARCHAR, city VARCHAR, "
+            "venue_id INTEGER PRIMARY KEY, venue_name VARCHAR, "
+            "num_upcoming_shows INTEGER, refreshed_at DATETIME)"))
+    monkeypatch.setattr(queries, 'summary_enabled', lambda: True)
+    monkeypatch.setattr(queries, 'ensure_fresh', lambda: None)
+    app.extensions['page_cache'] = MemoryCache(100, 60)
+
+    def refresh(name, refreshed_at):
+        with db.engine.begin() as connection:
+            connection.execute(text('DELETE FROM venue_area_summary'))
+            connection.execute(text(
+                "INSERT INTO venue_area_summary VALUES "
+                "('CA', 'San Francisco', 1, :name, 1, :refreshed_at)"),
+                {'name': name, 'refreshed_at': refreshed_at})
+    return refresh
+
+
+def test_venues_revalidate_against_the_summary(client, summary_view):
+    summary_view('The Musical Hop', '2030-01-01 12:00:00.000000')
+    first = client.get('/venues')
+    assert b'The Musical Hop' in first.data
+    etag = first.headers['ETag']
+
+    # A write the view has not picked up yet leaves the page as it is.
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "UPDATE venues SET name = 'The Dueling Pianos Bar', "
+            "updated_at = '2030-01-01 12:00:30.000000'"))
+    assert client.get('/venues', headers={'If-None-Match': etag}) \
+        .status_code == 304
+
+    # The refresh changes the validator, and the page cached from the old
+    # contents is not served even though 'venues' was never invalidated.
+    summary_view('The Dueling Pianos Bar', '2030-01-01 12:01:00.000000')
+    after = client.get('/venues', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert b'The Dueling Pianos Bar' in after.data
+
+
+@pytest.mark.parametrize('path', ['/venues', '/shows', '/venues/1',
+                                  '/artists/1'])
+def test_revalidation_skips_the_page_work(client, clock, catalog, statements,
+                                          rendered, path):
+    # If-Modified-Since takes the same path as a matching If-None-Match and
+    # needs no first render, which for detail pages needs Postgres.
+    response = client.get(path, headers={
+        'If-Modified-Since': 'Tue, 01 Jan 2030 00:00:00 GMT'})
+    assert response.status_code == 304
+    assert statements.count == 1
+    assert rendered == []
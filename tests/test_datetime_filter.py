@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+import dateutil.parser
+import pytest
+
+from app import format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+    """The filter as it was before patterns were precompiled."""
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+VALUES = [
+    datetime(2030, 1, 5, 20, 30),
+    datetime(2030, 12, 31, 9, 5, 59, 123456),
+    datetime(2030, 7, 4, 0, 0, tzinfo=timezone(timedelta(hours=-8))),
+]
+FORMATS = ['full', 'medium', 'yyyy-MM-dd HH:mm:ss z', "EEE, MMM d 'at' h a"]
+
+
+@pytest.mark.parametrize('format', FORMATS)
+@pytest.mark.parametrize('value', VALUES, ids=str)
+def test_matches_the_legacy_filter(value, format):
+    expected = legacy_format_datetime(str(value), format)
+    assert format_datetime(value, format) == expected
+    assert format_datetime(str(value), format) == expected
+
+
+def test_parses_strings_iso_format_cannot():
+    assert format_datetime('Jan 5 2030 8:30pm') == \
+        legacy_format_datetime('Jan 5 2030 8:30pm')
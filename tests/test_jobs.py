@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, text
+
+import jobs
+from models import db, Job, Show
+
+STAMP = '2030-01-01 00:00:00.000000'
+
+
+@pytest.fixture
+def running(app):
+    """Add a job that started an hour ago with the given heartbeat."""
+    def add(heartbeat_at):
+        started_at = datetime.utcnow() - timedelta(hours=1)
+        entry = Job(kind='delete_venue', payload={'venue_id': 1},
+                    status='running', attempts=1, created_at=started_at,
+                    started_at=started_at, heartbeat_at=heartbeat_at)
+        db.session.add(entry)
+        db.session.commit()
+        return entry.id
+    return add
+
+
+def test_beating_job_is_not_run_twice(running):
+    job_id = running(datetime.utcnow())
+    assert jobs.stale_job_ids() == []
+    assert not jobs._claim(job_id)
+
+
+def test_job_without_a_heartbeat_is_reclaimed(running):
+    job_id = running(datetime.utcnow() - timedelta(minutes=10))
+    assert jobs.stale_job_ids() == [job_id]
+    assert jobs._claim(job_id)
+    assert db.session.get(Job, job_id).attempts == 2
+
+
+def test_heartbeat_stamps_the_running_job(app, running):
+    job_id = running(datetime.utcnow() - timedelta(minutes=10))
+
+    class OneBeat:
+        beats = 0
+
+        def wait(self, timeout):
+            self.beats += 1
+            return self.beats > 1
+
+    jobs._beat(app, job_id, OneBeat())
+    db.session.expire_all()
+    assert jobs.stale_job_ids() == []
+
+
+def test_delete_venue_drops_cached_pages_before_each_batch(app, monkeypatch):
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO venues (id, name, city, state, updated_at) "
+            f"VALUES (1, 'The Musical Hop', 'San Francisco', 'CA', '{STAMP}')"))
+        for day in range(1, 4):
+            connection.execute(text(
+                "INSERT INTO shows (venue_id, artist_id, start_time, "
+                f"updated_at) VALUES (1, {day}, "
+                f"'2030-01-0{day} 20:00:00.000000', '{STAMP}')"))
+    remaining = []
+    monkeypatch.setattr(jobs, 'JOB_DELETE_BATCH', 2)
+    monkeypatch.setattr(jobs.page_cache, 'invalidate', lambda *tags: remaining
+                        .append(db.session.scalar(
+                            select(func.count()).select_from(Show))))
+
+    assert jobs.delete_venue(1) == {'deleted_shows': 3, 'deleted': True}
+    assert remaining == [3, 1, 0, 0]
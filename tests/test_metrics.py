@@ -0,0 +1,14 @@
+import logging
+
+from sqlalchemy import text
+
+from models import db
+
+
+def test_slow_queries_go_to_the_app_log_without_a_request_log(app, caplog):
+    app.config['SLOW_QUERY_SECONDS'] = 0
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        db.session.execute(text('SELECT :answer'), {'answer': 42})
+    [record] = [r for r in caplog.records if r.name == app.logger.name]
+    assert 'SELECT ?' in record.getMessage()
+    assert '42' in record.getMessage()
@@ -0,0 +1,96 @@
+import fnmatch
+
+import pytest
+
+from cache import RedisCache
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis client calls RedisCache makes.
+
+    Expiries are recorded as seconds and never elapse; ttl() follows
+    Redis: -2 for a missing key, -1 for a key without an expiry.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry.pop(key, None)
+        if ex is not None:
+            self.expiry[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def expire(self, key, seconds):
+        if key in self.data:
+            self.expiry[key] = seconds
+
+    def ttl(self, key):
+        if key not in self.data:
+            return -2
+        return self.expiry.get(key, -1)
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.data)
+                if fnmatch.fnmatchcase(key, pattern)]
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(client):
+    return RedisCache(client, default_ttl=60)
+
+
+def test_get_set_and_delete(cache):
+    assert cache.get('venues') is None
+    cache.set('venues', {'areas': []})
+    assert cache.get('venues') == {'areas': []}
+    cache.delete('venues')
+    assert cache.get('venues') is None
+
+
+def test_invalidate_drops_tagged_keys_only(cache, client):
+    cache.set('venue:1', 'one', tags=('venue:1', 'venues'))
+    cache.set('venue:2', 'two', tags=('venue:2', 'venues'))
+    cache.set('artists', 'all artists', tags=('artists',))
+    cache.invalidate('venue:1')
+    assert cache.get('venue:1') is None
+    assert cache.get('venue:2') == 'two'
+    cache.invalidate('venues')
+    assert cache.get('venue:2') is None
+    assert cache.get('artists') == 'all artists'
+    assert 'fyyur:tag:venues' not in client.data
+
+
+def test_tag_expiry_is_never_shortened(cache, client):
+    cache.set('venues', 'listing', ttl=300, tags=('venues',))
+    cache.set('venue:1', 'page', ttl=10, tags=('venues',))
+    assert client.ttl('fyyur:tag:venues') == 300
+    cache.set('venue:2', 'page', ttl=600, tags=('venues',))
+    assert client.ttl('fyyur:tag:venues') == 600
+
+
+def test_clear_only_touches_prefixed_keys(cache, client):
+    client.set('other:key', b'kept')
+    cache.set('venues', 'listing', tags=('venues',))
+    cache.clear()
+    assert client.data == {'other:key': b'kept'}
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+import references
+from models import db, Venue
+
+
+@pytest.fixture
+def known(app):
+    references.invalidate(Venue)
+    db.session.add(Venue(id=1, name='The Musical Hop',
+                         updated_at=datetime.now()))
+    db.session.commit()
+    yield references.known_ids(Venue)
+    references.invalidate(Venue)
+
+
+def test_rolled_back_insert_is_not_known(known):
+    db.session.add(Venue(id=2, name='Park Square', updated_at=datetime.now()))
+    db.session.flush()
+    db.session.rollback()
+    assert 2 not in known
+
+    db.session.add(Venue(id=2, name='Park Square', updated_at=datetime.now()))
+    db.session.commit()
+    assert 2 in known
+
+
+def test_rolled_back_delete_stays_known(known):
+    db.session.delete(db.session.get(Venue, 1))
+    db.session.flush()
+    db.session.rollback()
+    assert 1 in known
+
+    db.session.delete(db.session.get(Venue, 1))
+    db.session.commit()
+    assert 1 not in known
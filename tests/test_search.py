@@ -0,0 +1,42 @@
+import warnings
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import search
+from models import db, Venue
+from search import search_stmt
+
+
+def compiled(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+@pytest.mark.parametrize('term', ['', '   ', None])
+def test_blank_term_has_no_conditions(app, term):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        stmt = compiled(search_stmt(Venue, term))
+    assert 'WHERE' not in str(stmt)
+
+
+def test_wildcards_match_literally(app):
+    params = compiled(search_stmt(Venue, '50% off_')).params
+    assert set(params.values()) >= {'%50/%%', '%off/_%', '%50/% off/_%'}
+
+
+def test_memory_index_ignores_rolled_back_writes(app):
+    search.invalidate(Venue)
+    assert search.search(Venue, 'park') == []
+    db.session.add(Venue(id=1, name='Park Square Live Music',
+                         updated_at=datetime.now()))
+    db.session.flush()
+    search.search(Venue, 'park')
+    db.session.rollback()
+    assert search.search(Venue, 'park') == []
+
+    db.session.add(Venue(id=1, name='Park Square Live Music',
+                         updated_at=datetime.now()))
+    db.session.commit()
+    assert search.search(Venue, 'park') == [(1, 'Park Square Live Music')]
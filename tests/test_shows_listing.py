@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import text
+
+from models import db
+
+STAMP = '2030-01-01 00:00:00.000000'
+
+
+@pytest.fixture
+def catalog(app):
+    """Three venues and three artists, each in several shows."""
+    with db.engine.begin() as connection:
+        for i in range(1, 4):
+            connection.execute(text(
+                "INSERT INTO venues (id, name, city, state, updated_at) "
+                f"VALUES ({i}, 'Venue {i}', 'San Francisco', 'CA', '{STAMP}')"))
+            connection.execute(text(
+                "INSERT INTO artists (id, name, city, state, updated_at) "
+                f"VALUES ({i}, 'Artist {i}', 'San Francisco', 'CA', "
+                f"'{STAMP}')"))
+        for i in range(9):
+            connection.execute(text(
+                "INSERT INTO shows (venue_id, artist_id, start_time, "
+                f"updated_at) VALUES ({i % 3 + 1}, {i // 3 + 1}, "
+                f"'2030-01-{i + 2:02d} 20:00:00.000000', '{STAMP}')"))
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_shows_is_one_query_after_the_validator(app, client, catalog,
+                                                statements, stream):
+    app.config['STREAM_SHOWS'] = stream
+    response = client.get('/shows')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count('Artist 3') == 3
+    # catalog_validator() and the joined page query, however many shows.
+    assert statements.count == 2
@@ -0,0 +1,165 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import inspect, select
+
+from commit_queue import CommitQueue
+from models import db, Venue, Artist
+
+# ----------------------------------------------------------------------------#
+# Name typeahead for the new-show form.
+#
+# Each process holds, per model, a sorted list of (key, id) pairs where the
+# keys are the lowercased name from each word on ("the musical hop",
+# "musical hop", "hop"), so a prefix lookup is a bisect plus a short scan.
+# The index is loaded with one (id, name) query on first use, patched in
+# place when this process commits a create, rename or delete, and reloaded
+# in the background once it is older than TYPEAHEAD_MAX_AGE seconds to pick
+# up other workers' writes.
+# ----------------------------------------------------------------------------#
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def name_keys(name):
+    """The lowercased name from the start of each of its words."""
+    words = (name or '').lower().split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs answering name-prefix lookups."""
+
+    def __init__(self, rows=()):
+        self.names = {}
+        self.keys = []
+        self.lock = threading.Lock()
+        for entity_id, name in rows:
+            self.names[entity_id] = name
+            self.keys.extend((key, entity_id) for key in name_keys(name))
+        self.keys.sort()
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, entity_id, name):
+        with self.lock:
+            self._remove(entity_id)
+            self.names[entity_id] = name
+            for key in name_keys(name):
+                insort(self.keys, (key, entity_id))
+
+    def remove(self, entity_id):
+        with self.lock:
+            self._remove(entity_id)
+
+    def _remove(self, entity_id):
+        name = self.names.pop(entity_id, None)
+        if name is None:
+            return
+        for key in name_keys(name):
+            i = bisect_left(self.keys, (key, entity_id))
+            if i < len(self.keys) and self.keys[i] == (key, entity_id):
+                del self.keys[i]
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """Up to `limit` (id, name) pairs with a word starting with `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self.lock:
+            i = bisect_left(self.keys, (prefix,))
+            while i < len(self.keys) and len(found) < limit:
+                key, entity_id = self.keys[i]
+                if not key.startswith(prefix):
+                    break
+                found.setdefault(entity_id, self.names[entity_id])
+                i += 1
+        return list(found.items())
+
+
+_indexes = {}
+_lock = threading.Lock()
+_reloading = set()
+
+
+def _load(model):
+    index = PrefixIndex(db.session.execute(
+        select(model.id, model.name)).all())
+    with _lock:
+        _indexes[model.__tablename__] = index
+    return index
+
+
+def _reload(app, model):
+    try:
+        with app.app_context():
+            _load(model)
+            db.session.remove()
+    finally:
+        with _lock:
+            _reloading.discard(model.__tablename__)
+
+
+def prefix_index(model):
+    """The PrefixIndex for `model`, loaded on first use.
+
+    An index older than TYPEAHEAD_MAX_AGE keeps answering while a
+    background thread loads its replacement (about a second for 100k
+    names).
+    """
+    index = _indexes.get(model.__tablename__)
+    if index is None:
+        return _load(model)
+    max_age = current_app.config.get('TYPEAHEAD_MAX_AGE', 300)
+    if time.monotonic() - index.loaded_at > max_age:
+        with _lock:
+            if model.__tablename__ in _reloading:
+                return index
+            _reloading.add(model.__tablename__)
+        threading.Thread(target=_reload, name='fyyur-typeahead', daemon=True,
+                         args=(current_app._get_current_object(), model)) \
+            .start()
+    return index
+
+
+def lookup(model, prefix, limit=DEFAULT_LIMIT):
+    return prefix_index(model).lookup(prefix, min(limit, MAX_LIMIT))
+
+
+def invalidate(model):
+    with _lock:
+        _indexes.pop(model.__tablename__, None)
+
+
+def _apply(change):
+    table, entity_id, name = change
+    index = _indexes.get(table)
+    if index is None:
+        return
+    if name is None:
+        index.remove(entity_id)
+    else:
+        index.add(entity_id, name)
+
+
+def _renamed(target):
+    if inspect(target).attrs.name.history.has_changes():
+        return type(target).__tablename__, target.id, target.name
+
+
+_writes = CommitQueue('typeahead', (Venue, Artist), _apply, invalidate)
+_writes.listen('after_insert', lambda target: (
+    type(target).__tablename__, target.id, target.name))
+_writes.listen('after_update', _renamed)
+_writes.listen('after_delete', lambda target: (
+    type(target).__tablename__, target.id, None))